@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import pickle
+import hashlib
+import threading
+from datetime import date
+from collections import OrderedDict
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from api.database import fetch_one
+from api.metrics import record_cache, record_serialization
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+CACHE_BACKEND = os.getenv("API_CACHE_BACKEND", "local")
+CACHE_TTL = float(os.getenv("API_CACHE_TTL", "3600"))
+CACHE_MAX_ENTRIES = int(os.getenv("API_CACHE_MAX_ENTRIES", "512"))
+CACHE_MAX_BYTES = int(os.getenv("API_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+TILE_CACHE_MAX_ENTRIES = int(os.getenv("TILE_CACHE_MAX_ENTRIES", "20000"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# how long a data_version read is trusted before asking Postgres again
+DATA_VERSION_CHECK_INTERVAL = float(os.getenv("DATA_VERSION_CHECK_INTERVAL", "5"))
+
+
+# in-process LRU with per-entry TTL, bounded by entry count and total bytes
+class LocalCacheBackend:
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=CACHE_TTL):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._bytes += len(value)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _drop(self, key):
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value)
+
+
+# stand-in for a shared cache: values round-trip through bytes like they would over the network
+class LocalSharedCacheBackend(LocalCacheBackend):
+    def get(self, key):
+        value = super().get(key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl=CACHE_TTL):
+        super().set(key, pickle.dumps(value), ttl)
+
+
+class RedisCacheBackend:
+    def __init__(self, url=REDIS_URL, prefix="defence-api:"):
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl=CACHE_TTL):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=max(1, int(ttl)))
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(key)
+
+
+def create_backend(name=CACHE_BACKEND, max_entries=CACHE_MAX_ENTRIES):
+    if name == "redis":
+        if redis is None:
+            print("redis is not installed, falling back to the local cache")
+            return LocalCacheBackend(max_entries)
+        return RedisCacheBackend()
+    if name == "shared-local":
+        return LocalSharedCacheBackend(max_entries)
+    return LocalCacheBackend(max_entries)
+
+
+cache = create_backend()
+# tiles are small and numerous, keep them out of the json cache so they can't evict dashboard responses
+tile_cache = create_backend(max_entries=TILE_CACHE_MAX_ENTRIES)
+
+_data_version = {"value": None, "checked": 0.0}
+
+
+async def get_data_version():
+    # bumped by insert_data / lambda_handler after every committed ingestion run
+    if _data_version["value"] is None or time.monotonic() - _data_version["checked"] > DATA_VERSION_CHECK_INTERVAL:
+        try:
+            row = await fetch_one("SELECT version FROM data_version WHERE id = 1", observe=False)
+            _data_version["value"] = row[0] if row else 0
+        except Exception as e:
+            print("failed to read data_version:  ", e)
+            if _data_version["value"] is None:
+                _data_version["value"] = 0
+        _data_version["checked"] = time.monotonic()
+    return _data_version["value"]
+
+
+def normalize_params(params):
+    normalized = {}
+    for name, value in sorted(params.items()):
+        if value is None or value == "":
+            continue
+        if isinstance(value, str) and "," in value:
+            value = ",".join(sorted({v.strip() for v in value.split(",") if v.strip()}))
+        normalized[name] = value
+    return normalized
+
+
+def cache_key(endpoint, params, version):
+    # the date is part of the key because some aggregates are relative to CURRENT_DATE
+    return f"{endpoint}|{json.dumps(normalize_params(params), default=str)}|v{version}|{date.today()}"
+
+
+def make_etag(key):
+    return 'W/"' + hashlib.sha1(key.encode()).hexdigest() + '"'
+
+
+def encode_json(result):
+    return json.dumps(jsonable_encoder(result)).encode()
+
+
+async def cached_response(request: Request, endpoint, params, producer, backend=None,
+                          media_type="application/json", encode=encode_json):
+    backend = backend or cache
+    version = await get_data_version()
+    key = cache_key(endpoint, params, version)
+    etag = make_etag(key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        record_cache(True)
+        return Response(status_code=304, headers=headers)
+
+    body = backend.get(key)
+    record_cache(body is not None)
+    if body is None:
+        data = await producer()
+        start = time.perf_counter()
+        body = encode(data)
+        record_serialization(time.perf_counter() - start)
+        backend.set(key, body)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+async def cached_json(request: Request, endpoint, params, producer):
+    return await cached_response(request, endpoint, params, producer)
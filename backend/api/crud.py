@@ -1,19 +1,81 @@
-from api.database import get_connection
+from api.database import fetch_all, fetch_one, pooled_connection, observe_query_sync
+from datetime import date
+import os
 import json
+import base64
+import time
+import asyncio
 
-def fetch_filtered_events(states=None, event_types=None, from_year=None, to_year=None):
-    conn = get_connection()
-    cur = conn.cursor()
 
-    base_query = """
-        SELECT event_id_cnty, event_date, event_type, sub_event_type, location,
-               latitude, longitude, ST_AsGeoJSON(geom)::json
-        FROM defence_data_union
-        WHERE 1=1
-    """
+def _to_date(value):
+    # asyncpg only binds real date objects to DATE columns
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+def parse_date_bound(value, end=False):
+    # from_year / to_year: an ISO date as FilterPanel.jsx sends, or a bare year for Jan 1 / Dec 31
+    if value is None or isinstance(value, date):
+        return value
+    value = str(value).strip()
+    if len(value) == 4 and value.isdigit():
+        return date(int(value), 12, 31) if end else date(int(value), 1, 1)
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        raise ValueError(f"invalid date {value!r}, expected YYYY-MM-DD or YYYY")
+
+EVENT_PAGE_SIZE = int(os.getenv("EVENT_PAGE_SIZE", "500"))
+EVENT_PAGE_MAX_SIZE = int(os.getenv("EVENT_PAGE_MAX_SIZE", "5000"))
+
+def encode_cursor(event_date, event_id):
+    payload = json.dumps([str(event_date), str(event_id)]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        event_date, event_id = json.loads(payload)
+        return _to_date(event_date), str(event_id)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+def build_keyset_page(cursor, limit):
+    # keyset on (event_date, event_id_cnty) desc, served by the matching composite indexes
+    # (see psql_scripts.sql); rows with no event_date have no position in the ordering
+    filters = "AND event_date IS NOT NULL"
+    params = []
+    if cursor:
+        filters += " AND (event_date, event_id_cnty) < (%s, %s)"
+        params.extend(decode_cursor(cursor))
+    order = " ORDER BY event_date DESC, event_id_cnty DESC LIMIT %s"
+    # one extra row tells us whether there is a next page
+    return filters, order, params + [limit + 1]
+
+def split_page(rows, limit, date_index, id_index):
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1][date_index], rows[-1][id_index])
+
+def parse_bbox(bbox):
+    # "min_lon,min_lat,max_lon,max_lat", the same order as ST_MakeEnvelope and mapbox getBounds().toArray().flat()
+    if bbox is None or isinstance(bbox, (list, tuple)):
+        return bbox
+    parts = [float(p) for p in bbox.split(",")]
+    if len(parts) != 4 or parts[0] > parts[2] or parts[1] > parts[3]:
+        raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+    return parts
+
+def build_event_filters(states=None, event_types=None, from_year=None, to_year=None, bbox=None):
     filters = []
     params = []
 
+    if bbox:
+        # && is answered from the GIST indexes on geom
+        filters.append("AND geom && ST_MakeEnvelope(%s, %s, %s, %s, 4326)")
+        params.extend(parse_bbox(bbox))
+
     if states:
         state_list = states if isinstance(states, list) else states.split(",")
         filters.append("AND admin1 = ANY(%s)")
@@ -26,30 +88,160 @@ def fetch_filtered_events(states=None, event_types=None, from_year=None, to_year
 
     if from_year:
         filters.append("AND event_date >= %s")
-        params.append(from_year)
+        params.append(parse_date_bound(from_year))
 
     if to_year:
         filters.append("AND event_date <= %s")
-        params.append(to_year)
+        params.append(parse_date_bound(to_year, end=True))
+
+    return "\n".join(filters), params
+
+# below this zoom level the map gets grid clusters instead of individual events
+CLUSTER_MAX_ZOOM = int(os.getenv("CLUSTER_MAX_ZOOM", "10"))
+# grid cells per 256px tile width, ~50px cells like the mapbox clusterRadius in MapView.jsx
+CLUSTER_CELLS_PER_TILE = int(os.getenv("CLUSTER_CELLS_PER_TILE", "5"))
+
+async def fetch_filtered_events(states=None, event_types=None, from_year=None, to_year=None, bbox=None, zoom=None,
+                                limit=None, cursor=None):
+    filters, params = build_event_filters(states, event_types, from_year, to_year, bbox)
+
+    if zoom is not None and zoom < CLUSTER_MAX_ZOOM:
+        return await fetch_event_clusters(filters, params, zoom)
+
+    base_query = """
+        SELECT event_id_cnty, event_date, event_type, sub_event_type, location,
+               latitude, longitude, ST_AsGeoJSON(geom)::json
+        FROM defence_events
+        WHERE 1=1
+    """
+    if limit is None and cursor is None:
+        rows = await fetch_all(base_query + filters, params)
+        return format_geojson(rows)
+
+    limit = min(limit or EVENT_PAGE_SIZE, EVENT_PAGE_MAX_SIZE)
+    page_filters, order, page_params = build_keyset_page(cursor, limit)
+    rows = await fetch_all(base_query + filters + "\n" + page_filters + order, params + page_params)
+    rows, next_cursor = split_page(rows, limit, 1, 0)
+
+    geojson = format_geojson(rows)
+    geojson["next_cursor"] = next_cursor
+    return geojson
+
+async def fetch_event_clusters(filters, params, zoom):
+    cell_size = 360.0 / (2 ** max(zoom, 0)) / CLUSTER_CELLS_PER_TILE
+    rows = await fetch_all("""
+        SELECT ST_AsGeoJSON(ST_Centroid(ST_Collect(geom)))::json, count(*), sum(fatalities)
+        FROM defence_events
+        WHERE geom IS NOT NULL
+    """ + filters + """
+        GROUP BY ST_SnapToGrid(geom, %s)
+    """, params + [cell_size])
+    return format_cluster_geojson(rows)
+
+def format_cluster_geojson(rows):
+    # point_count / point_count_abbreviated mirror mapbox's own cluster properties so the
+    # existing cluster layers render these features unchanged
+    return {
+        "type": "FeatureCollection",
+        "clustered": True,
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": row[0],
+                "properties": {
+                    "cluster": True,
+                    "cluster_id": i,
+                    "point_count": row[1],
+                    "point_count_abbreviated": f"{row[1] / 1000:.1f}k" if row[1] >= 1000 else str(row[1]),
+                    "fatalities": row[2] or 0
+                }
+            } for i, row in enumerate(rows)
+        ]
+    }
+
+
+async def get_event_tile(z, x, y, states=None, event_types=None, from_year=None, to_year=None):
+    filters, params = build_event_filters(states, event_types, from_year, to_year)
+    row = await fetch_one("""
+        WITH bounds AS (
+            SELECT ST_TileEnvelope(%s, %s, %s) AS tile_geom
+        ),
+        mvtgeom AS (
+            SELECT ST_AsMVTGeom(ST_Transform(geom, 3857), bounds.tile_geom) AS geom,
+                   event_id_cnty AS event_id, event_date::text AS event_date, event_type, sub_event_type,
+                   location, latitude, longitude, fatalities
+            FROM defence_events, bounds
+            WHERE geom && ST_Transform(bounds.tile_geom, 4326)
+    """ + filters + """
+        )
+        SELECT ST_AsMVT(mvtgeom.*, 'events') FROM mvtgeom
+    """, [z, x, y] + params)
+    return bytes(row[0]) if row and row[0] is not None else b""
+
+
+STREAM_BATCH_SIZE = int(os.getenv("GEOJSON_STREAM_BATCH_SIZE", "2000"))
+
+# same feature shape as format_geojson, but built by Postgres so rows never become python dicts
+FEATURE_JSON_SQL = """
+    json_build_object(
+        'type', 'Feature',
+        'geometry', ST_AsGeoJSON(geom)::json,
+        'properties', json_build_object(
+            'event_id', COALESCE(event_id_cnty::text, 'None'),
+            'event_date', COALESCE(event_date::text, 'None'),
+            'event_type', COALESCE(event_type::text, 'None'),
+            'sub_event_type', COALESCE(sub_event_type::text, 'None'),
+            'location', COALESCE(location::text, 'None'),
+            'latitude', latitude::float8,
+            'longitude', longitude::float8,
+            'fatalities', 'N/A',
+            'notes', 'N/A'
+        )
+    )::text
+"""
+
+def stream_filtered_events(states=None, event_types=None, from_year=None, to_year=None, bbox=None, fmt="geojson", batch_size=STREAM_BATCH_SIZE):
+    # sync generator, starlette iterates it in a worker thread; the named cursor keeps
+    # the result set on the server and only batch_size rows are in memory at a time
+    filters, params = build_event_filters(states, event_types, from_year, to_year, bbox)
+    query = "SELECT " + FEATURE_JSON_SQL + " FROM defence_events WHERE 1=1 " + filters
 
-    final_query = base_query + "\n".join(filters)
-    cur.execute(final_query, params)
-    rows = cur.fetchall()
-    conn.close()
+    # db time is execute + fetchmany only, the time spent handing chunks to a slow client isn't the database's
+    db_seconds, row_count = 0.0, 0
+    with pooled_connection() as conn:
+        with conn.cursor(name="events_stream") as cur:
+            cur.itersize = batch_size
+            start = time.perf_counter()
+            cur.execute(query, params)
+            db_seconds += time.perf_counter() - start
 
-    return format_geojson(rows)
+            if fmt != "ndjson":
+                yield '{"type": "FeatureCollection", "features": ['
+            first = True
+            while True:
+                start = time.perf_counter()
+                rows = cur.fetchmany(batch_size)
+                db_seconds += time.perf_counter() - start
+                if not rows:
+                    break
+                row_count += len(rows)
+                if fmt == "ndjson":
+                    yield "".join(row[0] + "\n" for row in rows)
+                    continue
+                chunk = ",".join(row[0] for row in rows)
+                yield chunk if first else "," + chunk
+                first = False
+    observe_query_sync(query, params, db_seconds, row_count)
+    if fmt != "ndjson":
+        yield "]}"
  
-def get_event_by_id(event_id):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
+async def get_event_by_id(event_id):
+    row = await fetch_one("""
         SELECT event_id_cnty, event_date, event_type, sub_event_type, location, latitude, longitude,
                ST_AsGeoJSON(geom)::json
-        FROM defence_data_union
+        FROM defence_events
         WHERE event_id_cnty = %s
     """, (event_id,))
-    row = cur.fetchone()
-    conn.close()
 
     if row:
         return format_geojson([row])
@@ -77,144 +269,153 @@ def format_geojson(rows):
         ]
     }
 
-def get_kpi_summary():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT count(*) as total_events, 
-        sum(case when event_date >= date_trunc('week', CURRENT_DATE) - INTERVAL '7 days' AND event_date < date_trunc('week', CURRENT_DATE) then 1 else 0 end) as events_this_week,
-        sum(fatalities),
-        sum(case when event_type = 'Explosions/Remote violence' then 1 else 0 end) as explosions,
-        sum(case when event_type = 'Strategic developments' then 1 else 0 end) as strategic,
-        sum(civilian_targeting)
-        FROM defence_data_union
-    """)
-    rows = cur.fetchall()
-    conn.close()
-    # print("rows--------------====",rows)
+DASHBOARD_TTL = float(os.getenv("DASHBOARD_TTL", "5"))
+_dashboard = {"value": None, "expires": 0.0}
+_dashboard_lock = asyncio.Lock()
+
+# reads the per-(day, admin1, admin2, event_type) rollup maintained by insert triggers
+# (see psql_scripts.sql), each grouping set feeds one dashboard widget
+DASHBOARD_QUERY = """
+    SELECT
+        CASE
+            WHEN GROUPING(event_type) = 0 THEN 'event_type'
+            WHEN GROUPING(admin2, admin1) = 0 THEN 'location'
+            WHEN GROUPING(CONCAT('Q', EXTRACT(QUARTER FROM event_day), ' ', EXTRACT(YEAR FROM event_day))) = 0 THEN 'quarter'
+            ELSE 'total'
+        END AS grouping_set,
+        NULLIF(event_type, ''),
+        NULLIF(admin2, ''),
+        NULLIF(admin1, ''),
+        CONCAT('Q', EXTRACT(QUARTER FROM event_day), ' ', EXTRACT(YEAR FROM event_day)) AS quarter_year,
+        COALESCE(sum(event_count), 0) AS total_events,
+        sum(fatalities) AS fatalities,
+        COALESCE(sum(case when event_day >= date_trunc('week', CURRENT_DATE) - INTERVAL '7 days' AND event_day < date_trunc('week', CURRENT_DATE) then event_count else 0 end), 0) as events_this_week,
+        COALESCE(sum(case when event_type = 'Battles' then event_count else 0 end), 0) as battle,
+        COALESCE(sum(case when event_type = 'Explosions/Remote violence' then event_count else 0 end), 0) as explosion,
+        COALESCE(sum(case when event_type = 'Strategic developments' then event_count else 0 end), 0) as dev,
+        COALESCE(sum(case when event_type = 'Violence against civilians' then event_count else 0 end), 0) as violence,
+        sum(civilian_targeting) AS civilian_targeting,
+        min(event_day) AS first_event_date
+    FROM defence_event_rollup
+    GROUP BY GROUPING SETS (
+        (),
+        (event_type),
+        (admin2, admin1),
+        (CONCAT('Q', EXTRACT(QUARTER FROM event_day), ' ', EXTRACT(YEAR FROM event_day)))
+    )
+"""
+
+
+def format_dashboard(rows):
+    total = None
+    fatalities_by_type = []
+    locations = []
+    quarters = []
+    for r in rows:
+        grouping_set = r[0]
+        if grouping_set == "total":
+            total = r
+        elif grouping_set == "event_type":
+            if r[1] is not None and r[1] != 'Strategic developments':
+                fatalities_by_type.append({"event_type": r[1], "fatalities": r[6]})
+        elif grouping_set == "location":
+            locations.append(r)
+        elif grouping_set == "quarter":
+            quarters.append(r)
+
+    locations.sort(key=lambda r: r[5], reverse=True)
+    quarters.sort(key=lambda r: (r[13] is None, r[13]))
+
     return {
-      "total_events": rows[0][0],
-      "events_this_week": rows[0][1],
-      "fatalities": rows[0][2],
-      "explosions": rows[0][3],
-      "strategic": rows[0][4],
-      "civilian_targeting": rows[0][5]
+        "kpi": {
+          "total_events": total[5],
+          "events_this_week": total[7],
+          "fatalities": total[6],
+          "explosions": total[9],
+          "strategic": total[10],
+          "civilian_targeting": total[12]
+        },
+        "event_types": {
+          "Battles": total[8],
+          "Explosions / Remote violence": total[9],
+          "Strategic developments": total[10],
+          "Violence against civilians": total[11]
+        },
+        "event_fatalities": fatalities_by_type,
+        "top_locations": [
+            {
+              "location": r[2],
+              "state": r[3],
+              "event_count": r[5],
+              "fatalities": r[6]
+            }
+            for r in locations[:5]
+        ],
+        "event_trend": [
+            {
+              "quarter_year": r[4],
+              "Violence against civilians": r[11],
+              "Strategic developments": r[10],
+              "Battles": r[8],
+              "Explosions / Remote violence": r[9]
+            }
+            for r in quarters
+        ]
     }
-    
 
-def get_event_trend():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT 
-            CONCAT('Q', EXTRACT(QUARTER FROM event_date), ' ', EXTRACT(YEAR FROM event_date)) AS quarter_year,
-            sum(case when event_type = 'Violence against civilians' then 1 else 0 end) as violence,
-            sum(case when event_type = 'Strategic developments' then 1 else 0 end) as dev,
-            sum(case when event_type = 'Battles' then 1 else 0 end) as battle,
-            sum(case when event_type = 'Explosions/Remote violence' then 1 else 0 end) as explosion
-        FROM defence_data_union
-        GROUP BY 
-            quarter_year
-        ORDER BY MIN(event_date);
-    """)
-    rows = cur.fetchall()
-    conn.close()
-    # print("rows-----------",rows)
-    return [
-        {
-          "quarter_year": r[0],
-          "Violence against civilians": r[1],
-          "Strategic developments": r[2],
-          "Battles": r[3],
-          "Explosions / Remote violence": r[4]
-        }
-        for r in rows
-    ]
-
-
-
-def get_event_timeline():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT 
-            TO_CHAR(event_date, 'Month DD, YYYY'), event_type, admin2 || ',' || admin1, notes, fatalities
-        FROM defence_data_union
-        ORDER BY event_date desc limit 10;
-    """)
-    rows = cur.fetchall()
-    conn.close()
-    return [
-        {
-          "date": r[0],
-          "type": r[1],
-          "location": r[2],
-          "summary": r[3],
-          "fatalities": r[4]
-        }
-        for r in rows
-    ]
-    
-
-
-def get_event_type_summary():
-    # print('get_event_type_summary------------')
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
+
+async def get_dashboard_summary():
+    # the dashboard fires every widget endpoint at once, the lock makes them share a single scan
+    async with _dashboard_lock:
+        if _dashboard["value"] is not None and time.monotonic() < _dashboard["expires"]:
+            return _dashboard["value"]
+        rows = await fetch_all(DASHBOARD_QUERY)
+        _dashboard["value"] = format_dashboard(rows)
+        _dashboard["expires"] = time.monotonic() + DASHBOARD_TTL
+        return _dashboard["value"]
+
+
+async def get_kpi_summary():
+    return (await get_dashboard_summary())["kpi"]
+
+
+async def get_event_trend():
+    return (await get_dashboard_summary())["event_trend"]
+
+
+async def get_event_type_summary():
+    return (await get_dashboard_summary())["event_types"]
+
+
+async def get_top_locations():
+    return (await get_dashboard_summary())["top_locations"]
+
+
+async def get_fatalities_by_event_type():
+    return (await get_dashboard_summary())["event_fatalities"]
+
+
+async def get_event_timeline(limit=10, cursor=None):
+    limit = min(limit, EVENT_PAGE_MAX_SIZE)
+    page_filters, order, page_params = build_keyset_page(cursor, limit)
+    rows = await fetch_all("""
         SELECT 
-            sum(case when event_type = 'Battles' then 1 else 0 end) as battle,
-            sum(case when event_type = 'Explosions/Remote violence' then 1 else 0 end) as explosion,
-            sum(case when event_type = 'Strategic developments' then 1 else 0 end) as dev,
-            sum(case when event_type = 'Violence against civilians' then 1 else 0 end) as violence
-        FROM defence_data_union;
-    """)
-    r = cur.fetchall()
-    conn.close()
-    return{
-      "Battles": r[0][0],
-      "Explosions / Remote violence": r[0][1],
-      "Strategic developments": r[0][2],
-      "Violence against civilians": r[0][3]
+            TO_CHAR(event_date, 'Month DD, YYYY'), event_type, admin2 || ',' || admin1, notes, fatalities,
+            event_date, event_id_cnty
+        FROM defence_events
+        WHERE 1=1
+    """ + page_filters + order, page_params)
+    rows, next_cursor = split_page(rows, limit, 5, 6)
+    return {
+        "items": [
+            {
+              "date": r[0],
+              "type": r[1],
+              "location": r[2],
+              "summary": r[3],
+              "fatalities": r[4]
+            }
+            for r in rows
+        ],
+        "next_cursor": next_cursor
     }
-    
-def get_top_locations():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT admin2,admin1,
-            count(*),
-            sum(fatalities)
-        FROM defence_data_union
-        group by admin2, admin1
-        order by 3 desc limit 5;
-    """)
-    rows = cur.fetchall()
-    conn.close()
-    
-    return [
-        {
-          "location": r[0],
-          "state": r[1],
-          "event_count": r[2],
-          "fatalities": r[3]
-        }
-        for r in rows
-    ]
-
-
-def get_fatalities_by_event_type():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT event_type, SUM(fatalities) AS total_fatalities
-        FROM defence_data_union where event_type != 'Strategic developments'
-        GROUP BY event_type 
-    """)
-    rows = cur.fetchall()
-    conn.close()
-    
-    return [
-        {"event_type": r[0], "fatalities": r[1]}
-        for r in rows
-    ]
\ No newline at end of file
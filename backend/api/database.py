@@ -1,11 +1,319 @@
 import psycopg2
+from psycopg2 import pool
 import os
+import re
+import json
+import time
+import asyncio
+import threading
+from contextlib import contextmanager, asynccontextmanager
+
+from api.metrics import record_query, should_explain, record_slow_query, current_endpoint
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+DB_CONFIG = {
+    "dbname": os.getenv("PG_DB", "borderdata"),
+    "user": os.getenv("PG_USER", "postgres"),
+    "password": os.getenv("PG_PASS", ""),
+    "host": os.getenv("PG_HOST", "btdb.us-east-1.rds.amazonaws.com"),
+    "port": os.getenv("PG_PORT", "5432")
+}
+
+# pool sizing / behaviour
+POOL_MIN_SIZE = int(os.getenv("PG_POOL_MIN", "1"))
+POOL_MAX_SIZE = int(os.getenv("PG_POOL_MAX", "10"))
+POOL_TIMEOUT = float(os.getenv("PG_POOL_TIMEOUT", "10"))
+# connections idle longer than this are pinged with SELECT 1 before being handed out
+POOL_HEALTHCHECK_AFTER = float(os.getenv("PG_POOL_HEALTHCHECK_AFTER", "30"))
+# "asyncpg" uses the asyncio driver, anything else runs the sync pool in a worker thread
+ASYNC_DRIVER = os.getenv("PG_ASYNC_DRIVER", "asyncpg")
+
+
+class PoolTimeoutError(Exception):
+    pass
+
 
 def get_connection():
-    return psycopg2.connect(
-        dbname=os.getenv("PG_DB", "borderdata"),
-        user=os.getenv("PG_USER", "postgres"),
-        password=os.getenv("PG_PASS", ""),
-        host=os.getenv("PG_HOST", "btdb.us-east-1.rds.amazonaws.com"),
-        port=os.getenv("PG_PORT", "5432")
-    )
+    return psycopg2.connect(**DB_CONFIG)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_slots = threading.BoundedSemaphore(POOL_MAX_SIZE)
+_last_used = {}
+
+_async_pool = None
+_async_pool_lock = None
+
+_stats_lock = threading.Lock()
+_stats = {
+    "acquired": 0,
+    "timeouts": 0,
+    "health_check_failures": 0,
+    "wait_total_ms": 0.0,
+    "wait_max_ms": 0.0,
+    "in_use": 0,
+}
+
+
+def _record_acquire(wait_seconds):
+    wait_ms = wait_seconds * 1000
+    with _stats_lock:
+        _stats["acquired"] += 1
+        _stats["in_use"] += 1
+        _stats["wait_total_ms"] += wait_ms
+        _stats["wait_max_ms"] = max(_stats["wait_max_ms"], wait_ms)
+
+
+def _record_release():
+    with _stats_lock:
+        _stats["in_use"] -= 1
+
+
+def _record(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def pool_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["wait_avg_ms"] = round(stats["wait_total_ms"] / stats["acquired"], 3) if stats["acquired"] else 0.0
+    stats["min_size"] = POOL_MIN_SIZE
+    stats["max_size"] = POOL_MAX_SIZE
+    stats["driver"] = "asyncpg" if _use_async_driver() else "psycopg2"
+    if _async_pool is not None:
+        stats["async_pool_size"] = _async_pool.get_size()
+        stats["async_pool_idle"] = _async_pool.get_idle_size()
+    return stats
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pool.ThreadedConnectionPool(POOL_MIN_SIZE, POOL_MAX_SIZE, **DB_CONFIG)
+    return _pool
+
+
+def _is_healthy(conn):
+    if conn.closed:
+        return False
+    if time.monotonic() - _last_used.get(id(conn), 0) < POOL_HEALTHCHECK_AFTER:
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+@contextmanager
+def pooled_connection():
+    start = time.perf_counter()
+    # ThreadedConnectionPool raises instead of waiting when exhausted, the semaphore makes callers queue
+    if not _pool_slots.acquire(timeout=POOL_TIMEOUT):
+        _record("timeouts")
+        raise PoolTimeoutError(f"no database connection available after {POOL_TIMEOUT}s")
+
+    try:
+        # inside the try: creating the pool fails while the database is down, and the slot must go back
+        db_pool = _get_pool()
+        conn = db_pool.getconn()
+        if not _is_healthy(conn):
+            _record("health_check_failures")
+            db_pool.putconn(conn, close=True)
+            conn = db_pool.getconn()
+    except Exception:
+        _pool_slots.release()
+        raise
+
+    _record_acquire(time.perf_counter() - start)
+    broken = False
+    try:
+        yield conn
+        conn.rollback()
+    except psycopg2.Error:
+        broken = conn.closed != 0
+        if not broken:
+            conn.rollback()
+        raise
+    finally:
+        _last_used[id(conn)] = time.monotonic()
+        db_pool.putconn(conn, close=broken)
+        _pool_slots.release()
+        _record_release()
+
+
+def fetch_all_sync(query, params=None):
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(query, params)
+            return cur.fetchall()
+
+
+def fetch_one_sync(query, params=None):
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(query, params)
+            return cur.fetchone()
+
+
+def _use_async_driver():
+    return ASYNC_DRIVER == "asyncpg" and asyncpg is not None
+
+
+def _to_asyncpg(query):
+    # crud queries are written with psycopg2 %s placeholders, asyncpg wants $1..$n
+    counter = iter(range(1, query.count("%s") + 1))
+    return re.sub(r"%s", lambda _: f"${next(counter)}", query).replace("%%", "%")
+
+
+async def _init_async_connection(conn):
+    for json_type in ("json", "jsonb"):
+        await conn.set_type_codec(json_type, encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+
+async def _get_async_pool():
+    global _async_pool, _async_pool_lock
+    if _async_pool is None:
+        if _async_pool_lock is None:
+            _async_pool_lock = asyncio.Lock()
+        async with _async_pool_lock:
+            if _async_pool is None:
+                _async_pool = await asyncpg.create_pool(
+                    database=DB_CONFIG["dbname"],
+                    user=DB_CONFIG["user"],
+                    password=DB_CONFIG["password"],
+                    host=DB_CONFIG["host"],
+                    port=int(DB_CONFIG["port"]),
+                    min_size=POOL_MIN_SIZE,
+                    max_size=POOL_MAX_SIZE,
+                    max_inactive_connection_lifetime=300,
+                    init=_init_async_connection,
+                )
+    return _async_pool
+
+
+@asynccontextmanager
+async def async_connection():
+    db_pool = await _get_async_pool()
+    start = time.perf_counter()
+    try:
+        conn = await db_pool.acquire(timeout=POOL_TIMEOUT)
+    except asyncio.TimeoutError:
+        _record("timeouts")
+        raise PoolTimeoutError(f"no database connection available after {POOL_TIMEOUT}s")
+    _record_acquire(time.perf_counter() - start)
+    try:
+        yield conn
+    finally:
+        await db_pool.release(conn)
+        _record_release()
+
+
+async def _fetch_all(query, params=None):
+    if _use_async_driver():
+        async with async_connection() as conn:
+            return await conn.fetch(_to_asyncpg(query), *(params or ()))
+    return await asyncio.to_thread(fetch_all_sync, query, params)
+
+
+async def _fetch_one(query, params=None):
+    if _use_async_driver():
+        async with async_connection() as conn:
+            return await conn.fetchrow(_to_asyncpg(query), *(params or ()))
+    return await asyncio.to_thread(fetch_one_sync, query, params)
+
+
+_explain_tasks = set()
+
+
+async def _capture_plan(endpoint, query, params, seconds):
+    try:
+        row = await _fetch_one("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query, params)
+        plan = row[0]
+        record_slow_query(endpoint, query, params, seconds, json.loads(plan) if isinstance(plan, str) else plan)
+    except Exception as e:
+        print("failed to explain slow query:  ", e)
+
+
+def _observe_query(query, params, seconds, rows):
+    record_query(seconds, rows)
+    if should_explain(query, seconds):
+        # off the request path; crud queries are read-only so running them again under ANALYZE is safe
+        task = asyncio.create_task(_capture_plan(current_endpoint(), query, params, seconds))
+        _explain_tasks.add(task)
+        task.add_done_callback(_explain_tasks.discard)
+
+
+async def fetch_all(query, params=None):
+    start = time.perf_counter()
+    rows = await _fetch_all(query, params)
+    _observe_query(query, params, time.perf_counter() - start, len(rows))
+    return rows
+
+
+async def fetch_one(query, params=None, observe=True):
+    # observe=False for bookkeeping reads (the data_version probe) that shouldn't count as the endpoint's db time
+    start = time.perf_counter()
+    row = await _fetch_one(query, params)
+    if observe:
+        _observe_query(query, params, time.perf_counter() - start, 0 if row is None else 1)
+    return row
+
+
+def _capture_plan_sync(endpoint, query, params, seconds):
+    try:
+        plan = fetch_one_sync("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query, params)[0]
+        record_slow_query(endpoint, query, params, seconds, json.loads(plan) if isinstance(plan, str) else plan)
+    except Exception as e:
+        print("failed to explain slow query:  ", e)
+
+
+def observe_query_sync(query, params, seconds, rows):
+    # same as _observe_query for code running in a worker thread (streamed responses), no event loop to schedule on
+    record_query(seconds, rows)
+    if should_explain(query, seconds):
+        threading.Thread(target=_capture_plan_sync, args=(current_endpoint(), query, params, seconds), daemon=True).start()
+
+
+async def check_health():
+    start = time.perf_counter()
+    try:
+        await fetch_one("SELECT 1")
+        healthy = True
+    except Exception as e:
+        print("database health check failed:  ", e)
+        _record("health_check_failures")
+        healthy = False
+    return {
+        "healthy": healthy,
+        "latency_ms": round((time.perf_counter() - start) * 1000, 3),
+        "pool": pool_stats()
+    }
+
+
+async def open_pools():
+    if _use_async_driver():
+        await _get_async_pool()
+    else:
+        await asyncio.to_thread(_get_pool)
+
+
+async def close_pools():
+    global _pool, _async_pool
+    if _async_pool is not None:
+        await _async_pool.close()
+        _async_pool = None
+    if _pool is not None:
+        _pool.closeall()
+        _pool = None
+        _last_used.clear()
@@ -1,12 +1,23 @@
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, Path, Query, Request, HTTPException
 from typing import Optional, List
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from api.database import open_pools, close_pools, check_health, pool_stats
+from api.metrics import MetricsMiddleware, snapshot, slow_queries, to_prometheus, SLOW_QUERY_MS
+from api.cache import cached_json, cached_response, tile_cache
 from api.crud import (
-    fetch_filtered_events, get_event_by_id,
-    get_kpi_summary, get_event_trend, get_event_timeline, get_event_type_summary, get_top_locations, get_fatalities_by_event_type
+    fetch_filtered_events, stream_filtered_events, parse_bbox, parse_date_bound, decode_cursor, get_event_tile, get_event_by_id,
+    get_dashboard_summary, get_kpi_summary, get_event_trend, get_event_timeline, get_event_type_summary, get_top_locations, get_fatalities_by_event_type
 )
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await open_pools()
+    yield
+    await close_pools()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,40 +26,145 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# per-endpoint latency, db vs serialization time, rows and bytes, see /metrics
+app.add_middleware(MetricsMiddleware)
+
+def validate_bbox(bbox):
+    try:
+        return parse_bbox(bbox)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def validate_cursor(cursor):
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+def validate_dates(from_year, to_year):
+    try:
+        parse_date_bound(from_year)
+        parse_date_bound(to_year, end=True)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/")
-def root():
+async def root():
     return {"message": "ACLED Events API is running."}
 
+@app.get("/health/db")
+async def db_health():
+    return await check_health()
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(to_prometheus(pool_stats()), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/json")
+async def metrics_json():
+    return {"endpoints": snapshot(), "pool": pool_stats()}
+
+@app.get("/metrics/slow-queries")
+async def metrics_slow_queries():
+    # empty unless SLOW_QUERY_MS is set
+    return {"threshold_ms": SLOW_QUERY_MS, "queries": slow_queries()}
+
 @app.get("/events/geojson/filter")
-def filter_events(
+async def filter_events(
+    request: Request,
+    states: Optional[str] = Query(None),
+    event_types: Optional[str] = Query(None),
+    from_year: Optional[str] = None,
+    to_year: Optional[str] = None,
+    bbox: Optional[str] = Query(None, description="min_lon,min_lat,max_lon,max_lat"),
+    zoom: Optional[int] = Query(None, ge=0, le=24),
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    stream: bool = False
+    ):
+    bbox = validate_bbox(bbox)
+    validate_cursor(cursor)
+    validate_dates(from_year, to_year)
+    if stream:
+        # the stream is the full filtered set in one response, it can't be thinned by zoom or paged
+        ignored = [name for name, value in (("zoom", zoom), ("limit", limit), ("cursor", cursor)) if value is not None]
+        if ignored:
+            raise HTTPException(status_code=400, detail=f"stream=true can't be combined with {', '.join(ignored)}")
+        return StreamingResponse(
+            stream_filtered_events(states, event_types, from_year, to_year, bbox),
+            media_type="application/geo+json"
+        )
+    params = {"states": states, "event_types": event_types, "from_year": from_year, "to_year": to_year,
+              "bbox": bbox, "zoom": zoom, "limit": limit, "cursor": cursor}
+    return await cached_json(request, "events", params,
+                             lambda: fetch_filtered_events(states, event_types, from_year, to_year, bbox, zoom,
+                                                           limit, cursor))
+
+@app.get("/events/ndjson/filter")
+async def filter_events_ndjson(
+    states: Optional[str] = Query(None),
+    event_types: Optional[str] = Query(None),
+    from_year: Optional[str] = None,
+    to_year: Optional[str] = None,
+    bbox: Optional[str] = Query(None, description="min_lon,min_lat,max_lon,max_lat")
+    ):
+    validate_dates(from_year, to_year)
+    return StreamingResponse(
+        stream_filtered_events(states, event_types, from_year, to_year, validate_bbox(bbox), fmt="ndjson"),
+        media_type="application/x-ndjson"
+    )
+
+@app.get("/tiles/{z}/{x}/{y}.mvt")
+async def event_tile(
+    request: Request,
+    z: int = Path(..., ge=0, le=24),
+    x: int = Path(..., ge=0),
+    y: int = Path(..., ge=0),
     states: Optional[str] = Query(None),
     event_types: Optional[str] = Query(None),
     from_year: Optional[str] = None,
     to_year: Optional[str] = None
     ):
-    return fetch_filtered_events(states, event_types, from_year, to_year)
+    if x >= 2 ** z or y >= 2 ** z:
+        raise HTTPException(status_code=400, detail="tile out of range")
+    validate_dates(from_year, to_year)
+    params = {"states": states, "event_types": event_types, "from_year": from_year, "to_year": to_year}
+    return await cached_response(request, f"tile/{z}/{x}/{y}", params,
+                                 lambda: get_event_tile(z, x, y, states, event_types, from_year, to_year),
+                                 backend=tile_cache, media_type="application/vnd.mapbox-vector-tile",
+                                 encode=lambda tile: tile)
+
+@app.get("/dashboard")
+async def dashboard(request: Request):
+    return await cached_json(request, "dashboard", {}, get_dashboard_summary)
 
 @app.get("/kpi-summary")
-def kpi_summary():
-    return get_kpi_summary()
+async def kpi_summary(request: Request):
+    return await cached_json(request, "kpi-summary", {}, get_kpi_summary)
 
 @app.get("/event-trend")
-def event_trend():
-    return get_event_trend()
+async def event_trend(request: Request):
+    return await cached_json(request, "event-trend", {}, get_event_trend)
 
 @app.get("/event-timeline")
-def event_timeline():
-    return get_event_timeline()
+async def event_timeline(
+    request: Request,
+    limit: int = Query(10, ge=1),
+    cursor: Optional[str] = None
+    ):
+    validate_cursor(cursor)
+    return await cached_json(request, "event-timeline", {"limit": limit, "cursor": cursor},
+                             lambda: get_event_timeline(limit, cursor))
     
 @app.get("/event-types-summary")
-def event_type_summary():
-    return get_event_type_summary()
+async def event_type_summary(request: Request):
+    return await cached_json(request, "event-types-summary", {}, get_event_type_summary)
     
 @app.get("/top-locations")
-def top_locations():
-    return get_top_locations()
+async def top_locations(request: Request):
+    return await cached_json(request, "top-locations", {}, get_top_locations)
     
 @app.get("/event-fatalities")
-def event_fatalities():
-    return get_fatalities_by_event_type()
\ No newline at end of file
+async def event_fatalities(request: Request):
+    return await cached_json(request, "event-fatalities", {}, get_fatalities_by_event_type)
\ No newline at end of file
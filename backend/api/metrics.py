@@ -0,0 +1,244 @@
+import os
+import time
+import threading
+from collections import deque
+from contextvars import ContextVar
+
+from starlette.routing import Match
+
+# histogram buckets for request / db / serialization time, seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# recent observations kept per endpoint for the p50/p95/p99 in the json view
+METRICS_RESERVOIR_SIZE = int(os.getenv("METRICS_RESERVOIR_SIZE", "1000"))
+# opt-in: crud queries slower than this get an EXPLAIN (ANALYZE, BUFFERS) captured, 0 disables
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))
+# the same query text is explained at most once per interval, EXPLAIN ANALYZE runs it a second time
+SLOW_QUERY_EXPLAIN_INTERVAL = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", "300"))
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", "50"))
+
+# db / serialization time of the request being handled; asyncio.to_thread copies the context
+# so queries run in worker threads are attributed to the right request
+_current = ContextVar("request_metrics", default=None)
+
+
+def start_request(endpoint):
+    stats = {"endpoint": endpoint, "db_seconds": 0.0, "serialize_seconds": 0.0, "queries": 0, "rows": 0, "cache": None}
+    _current.set(stats)
+    return stats
+
+
+def current_endpoint():
+    stats = _current.get()
+    return stats["endpoint"] if stats else None
+
+
+def record_query(seconds, rows):
+    stats = _current.get()
+    if stats is not None:
+        stats["db_seconds"] += seconds
+        stats["queries"] += 1
+        stats["rows"] += rows
+
+
+def record_serialization(seconds):
+    stats = _current.get()
+    if stats is not None:
+        stats["serialize_seconds"] += seconds
+
+
+def record_cache(hit):
+    stats = _current.get()
+    if stats is not None:
+        stats["cache"] = "hit" if hit else "miss"
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=METRICS_RESERVOIR_SIZE)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def percentiles(self):
+        values = sorted(self.recent)
+        if not values:
+            return {}
+        pick = lambda q: round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 3)
+        return {"p50_ms": pick(0.5), "p95_ms": pick(0.95), "p99_ms": pick(0.99)}
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.latency = Histogram()
+        self.db = Histogram()
+        self.serialize = Histogram()
+        self.requests = {}
+        self.cache = {}
+        self.rows = 0
+        self.queries = 0
+        self.response_bytes = 0
+
+    def report(self):
+        return {
+            "requests": dict(self.requests),
+            "cache": dict(self.cache),
+            "latency": self.latency.percentiles(),
+            "db": self.db.percentiles(),
+            "serialize": self.serialize.percentiles(),
+            "avg_ms": round(self.latency.sum * 1000 / self.latency.count, 3) if self.latency.count else None,
+            "avg_db_ms": round(self.db.sum * 1000 / self.db.count, 3) if self.db.count else None,
+            "queries": self.queries,
+            "rows": self.rows,
+            "response_bytes": self.response_bytes,
+        }
+
+
+_lock = threading.Lock()
+_endpoints = {}
+_slow_queries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+_last_explained = {}
+
+
+def finish_request(stats, method, status, seconds, response_bytes):
+    key = f"{method} {stats['endpoint']}"
+    with _lock:
+        endpoint = _endpoints.setdefault(key, EndpointMetrics())
+        endpoint.requests[status] = endpoint.requests.get(status, 0) + 1
+        if stats["cache"]:
+            endpoint.cache[stats["cache"]] = endpoint.cache.get(stats["cache"], 0) + 1
+        endpoint.latency.observe(seconds)
+        endpoint.db.observe(stats["db_seconds"])
+        endpoint.serialize.observe(stats["serialize_seconds"])
+        endpoint.queries += stats["queries"]
+        endpoint.rows += stats["rows"]
+        endpoint.response_bytes += response_bytes
+
+
+def should_explain(query, seconds):
+    if SLOW_QUERY_MS <= 0 or seconds * 1000 < SLOW_QUERY_MS:
+        return False
+    now = time.monotonic()
+    with _lock:
+        if now - _last_explained.get(query, -SLOW_QUERY_EXPLAIN_INTERVAL) < SLOW_QUERY_EXPLAIN_INTERVAL:
+            return False
+        _last_explained[query] = now
+    return True
+
+
+def record_slow_query(endpoint, query, params, seconds, plan):
+    with _lock:
+        _slow_queries.append({
+            "at": time.time(),
+            "endpoint": endpoint,
+            "ms": round(seconds * 1000, 3),
+            "query": " ".join(query.split()),
+            "params": [str(p) for p in (params or ())],
+            "plan": plan,
+        })
+
+
+def slow_queries():
+    with _lock:
+        return list(reversed(_slow_queries))
+
+
+def snapshot():
+    with _lock:
+        return {key: endpoint.report() for key, endpoint in sorted(_endpoints.items())}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _histogram_lines(name, histogram, **labels):
+    lines = []
+    for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {count}")
+    lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {histogram.count}")
+    lines.append(f"{name}_sum{_labels(**labels)} {round(histogram.sum, 6)}")
+    lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+    return lines
+
+
+def route_path(scope):
+    # the route template ("/tiles/{z}/{x}/{y}.mvt"), raw paths would give every tile its own series
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    # plain ASGI so streamed responses are timed and measured up to their last chunk
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = start_request(route_path(scope))
+        start = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finish_request(stats, scope["method"], status, time.perf_counter() - start, size)
+
+
+def to_prometheus(pool=None):
+    latency, db, serialize = [], [], []
+    requests, rows, response_bytes, cache = [], [], [], []
+    with _lock:
+        for key, endpoint in sorted(_endpoints.items()):
+            method, path = key.split(" ", 1)
+            labels = {"method": method, "endpoint": path}
+            latency += _histogram_lines("api_request_seconds", endpoint.latency, **labels)
+            db += _histogram_lines("api_db_seconds", endpoint.db, **labels)
+            serialize += _histogram_lines("api_serialize_seconds", endpoint.serialize, **labels)
+            requests += [f"api_requests_total{_labels(**labels, status=status)} {n}" for status, n in sorted(endpoint.requests.items())]
+            cache += [f"api_cache_total{_labels(**labels, result=result)} {n}" for result, n in sorted(endpoint.cache.items())]
+            rows.append(f"api_rows_total{_labels(**labels)} {endpoint.rows}")
+            response_bytes.append(f"api_response_bytes_total{_labels(**labels)} {endpoint.response_bytes}")
+
+    lines = []
+    for name, kind, samples in [
+        ("api_request_seconds", "histogram", latency),
+        ("api_db_seconds", "histogram", db),
+        ("api_serialize_seconds", "histogram", serialize),
+        ("api_requests_total", "counter", requests),
+        ("api_cache_total", "counter", cache),
+        ("api_rows_total", "counter", rows),
+        ("api_response_bytes_total", "counter", response_bytes),
+    ]:
+        if samples:
+            lines.append(f"# TYPE {name} {kind}")
+            lines += samples
+    for key, value in (pool or {}).items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append(f"# TYPE api_db_pool_{key} gauge")
+            lines.append(f"api_db_pool_{key} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,93 @@
+import os
+import sys
+import json
+import time
+import socket
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+RESULTS_DIR = os.getenv("BENCH_RESULTS_DIR", os.path.join(BENCH_DIR, "results"))
+
+# same PG_* variables as the API, pointed at a local PostGIS for benchmarking
+DB_CONFIG = {
+    "dbname": os.getenv("PG_DB", "borderdata_bench"),
+    "user": os.getenv("PG_USER", "postgres"),
+    "password": os.getenv("PG_PASS", ""),
+    "host": os.getenv("PG_HOST", "localhost"),
+    "port": os.getenv("PG_PORT", "5432")
+}
+
+
+def add_import_paths():
+    # backend is imported as the `api` package, the ingestion scripts import their siblings directly
+    for path in (os.path.join(REPO_DIR, "backend"),
+                 os.path.join(REPO_DIR, "data_engineering", "incremental_ingestion"),
+                 os.path.join(REPO_DIR, "data_engineering", "lambda_function")):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def latency_summary(seconds):
+    return {
+        "count": len(seconds),
+        "p50_ms": round(percentile(seconds, 0.50) * 1000, 3) if seconds else None,
+        "p95_ms": round(percentile(seconds, 0.95) * 1000, 3) if seconds else None,
+        "p99_ms": round(percentile(seconds, 0.99) * 1000, 3) if seconds else None,
+        "max_ms": round(max(seconds) * 1000, 3) if seconds else None,
+    }
+
+
+def git_revision():
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return sha + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(kind, results, settings):
+    # one file per run, named so `ls` sorts them in time order; compare.py diffs any two
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    now = datetime.now(timezone.utc)
+    revision = git_revision()
+    document = {
+        "kind": kind,
+        "revision": revision,
+        "recorded_at": now.isoformat(),
+        "host": socket.gethostname(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": settings,
+        "results": results,
+    }
+    path = os.path.join(RESULTS_DIR, f"{kind}-{now.strftime('%Y%m%dT%H%M%S')}-{revision}.json")
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2, default=str)
+    print(f"results written to {path}")
+    return path
+
+
+def time_calls(fn, repeat, warmup=1):
+    # per-call latencies, after a few untimed warm-up calls
+    for _ in range(warmup):
+        fn()
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+    return seconds
@@ -0,0 +1,89 @@
+import os
+import sys
+import json
+import glob
+import argparse
+
+from common import RESULTS_DIR
+
+# Diffs two stored benchmark runs, by default the two most recent of a kind:
+#   python benchmarks/compare.py --kind micro
+#   python benchmarks/compare.py results/load-A.json results/load-B.json --threshold 15 --fail-on-regression
+
+# (metric, True when bigger is better)
+METRICS = [("p50_ms", False), ("p95_ms", False), ("p99_ms", False),
+           ("items_per_second", True), ("requests_per_second", True)]
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def flatten(document):
+    # micro: {name: stats}, load: {endpoint: [stats per concurrency]}
+    flat = {}
+    for name, value in document["results"].items():
+        if isinstance(value, list):
+            for stats in value:
+                flat[f"{name}@c{stats['concurrency']}"] = stats
+        else:
+            flat[name] = value
+    return flat
+
+
+def latest(kind, count=2):
+    paths = sorted(glob.glob(os.path.join(RESULTS_DIR, f"{kind}-*.json")))
+    if len(paths) < count:
+        sys.exit(f"need {count} {kind} results in {RESULTS_DIR}, found {len(paths)}")
+    return paths[-count:]
+
+
+def compare(base, head, threshold):
+    rows = []
+    regressions = 0
+    base_flat, head_flat = flatten(base), flatten(head)
+    for name in sorted(set(base_flat) & set(head_flat)):
+        for metric, higher_is_better in METRICS:
+            before, after = base_flat[name].get(metric), head_flat[name].get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * 100
+            worse = -change if higher_is_better else change
+            flag = "REGRESSION" if worse > threshold else ("improved" if -worse > threshold else "")
+            regressions += flag == "REGRESSION"
+            rows.append((name, metric, before, after, change, flag))
+        # more failed requests than before is a regression whatever the threshold
+        before, after = base_flat[name].get("errors"), head_flat[name].get("errors")
+        if before is not None and after is not None and after > before:
+            change = (after - before) / before * 100 if before else float("inf")
+            regressions += 1
+            rows.append((name, "errors", before, after, change, "REGRESSION"))
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="*", help="base and head result files, defaults to the latest two of --kind")
+    parser.add_argument("--kind", choices=["micro", "load"], default="micro")
+    parser.add_argument("--threshold", type=float, default=10, help="percent change reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    base_path, head_path = args.files if len(args.files) == 2 else latest(args.kind)
+    base, head = load(base_path), load(head_path)
+    print(f"base {base['revision']} ({base['recorded_at']})  ->  head {head['revision']} ({head['recorded_at']})")
+    if base.get("host") != head.get("host"):
+        print(f"warning: recorded on different hosts ({base.get('host')} vs {head.get('host')})")
+
+    rows, regressions = compare(base, head, args.threshold)
+    print(f"{'benchmark':<36} {'metric':<20} {'base':>12} {'head':>12} {'change':>9}")
+    for name, metric, before, after, change, flag in rows:
+        print(f"{name:<36} {metric:<20} {before:>12} {after:>12} {change:>+8.1f}% {flag}")
+    print(f"{regressions} regression(s) over {args.threshold}%")
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
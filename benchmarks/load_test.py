@@ -0,0 +1,127 @@
+import time
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from common import latency_summary, save_results
+
+# Load test of every API endpoint at one or more concurrency levels, against a running server, e.g.
+#   uvicorn api.main:app --port 8000        (from backend/, PG_* pointing at the seeded database)
+#   python benchmarks/load_test.py --url http://localhost:8000 --concurrency 1 8 32 --duration 15
+# Run the server with API_CACHE_TTL=0 DASHBOARD_TTL=0 to measure the uncached path.
+
+# z5 tile over north-west India (Punjab, Delhi) and Kashmir viewports, all inside the synthetic data's extent;
+# dates are ISO like FilterPanel.jsx sends them
+ENDPOINTS = {
+    "root": "/",
+    "health_db": "/health/db",
+    "events_filter": "/events/geojson/filter?states=Jammu%20and%20Kashmir&from_year=2023-01-01&to_year=2025-12-31",
+    "events_page": "/events/geojson/filter?limit=500",
+    "events_bbox_clustered": "/events/geojson/filter?bbox=72.5,32.0,77.5,35.5&zoom=6",
+    "events_bbox_points": "/events/geojson/filter?bbox=74.6,33.9,75.0,34.2&zoom=12&limit=1000",
+    "events_stream": "/events/geojson/filter?stream=true&states=Manipur",
+    "events_ndjson": "/events/ndjson/filter?states=Manipur",
+    "tile": "/tiles/5/22/13.mvt",
+    "dashboard": "/dashboard",
+    "kpi_summary": "/kpi-summary",
+    "event_trend": "/event-trend",
+    "event_timeline": "/event-timeline?limit=20",
+    "event_types_summary": "/event-types-summary",
+    "top_locations": "/top-locations",
+    "event_fatalities": "/event-fatalities",
+    "metrics": "/metrics",
+}
+
+
+def request_once(url, timeout):
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            size = len(response.read())
+            return time.perf_counter() - start, response.status, size
+    except urllib.error.HTTPError as e:
+        return time.perf_counter() - start, e.code, 0
+    except Exception:
+        return time.perf_counter() - start, None, 0
+
+
+def is_success(status):
+    return status is not None and (200 <= status < 300 or status == 304)
+
+
+def run_endpoint(url, concurrency, duration, max_requests, timeout):
+    latencies = []
+    statuses = {}
+    total_bytes = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    issued = [0]
+
+    def worker():
+        nonlocal total_bytes
+        while time.perf_counter() < deadline:
+            with lock:
+                if max_requests and issued[0] >= max_requests:
+                    return
+                issued[0] += 1
+            seconds, status, size = request_once(url, timeout)
+            with lock:
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+                # error responses are counted, not timed, so a failing endpoint can't look fast
+                if is_success(status):
+                    latencies.append(seconds)
+                    total_bytes += size
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    elapsed = time.perf_counter() - start
+
+    errors = sum(statuses.values()) - len(latencies)
+    return {
+        **latency_summary(latencies),
+        "concurrency": concurrency,
+        "requests_per_second": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "errors": errors,
+        "statuses": statuses,
+        "avg_bytes": round(total_bytes / len(latencies)) if latencies else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--endpoints", nargs="+", choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=10, help="seconds per endpoint and concurrency level")
+    parser.add_argument("--max-requests", type=int, default=0, help="stop earlier after this many requests, 0 = no cap")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'endpoint':<24} {'conc':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'err':>5} {'bytes':>10}")
+    for name in args.endpoints:
+        url = args.url.rstrip("/") + ENDPOINTS[name]
+        # one untimed request so the first measurement isn't the cold cache fill
+        request_once(url, args.timeout)
+        results[name] = []
+        for concurrency in args.concurrency:
+            r = run_endpoint(url, concurrency, args.duration, args.max_requests, args.timeout)
+            results[name].append(r)
+            # percentiles are None when every request failed
+            print(f"{name:<24} {concurrency:>5} {r['requests_per_second']:>9} {str(r['p50_ms']):>9} {str(r['p95_ms']):>9} "
+                  f"{str(r['p99_ms']):>9} {r['errors']:>5} {r['avg_bytes']:>10}")
+
+    if not args.no_save:
+        save_results("load", results, {
+            "url": args.url, "concurrency": args.concurrency, "duration": args.duration,
+            "max_requests": args.max_requests, "endpoints": {n: ENDPOINTS[n] for n in args.endpoints},
+        })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import os
+import json
+import argparse
+from datetime import date, timedelta
+
+from common import FIXTURES_DIR, REPO_DIR, DB_CONFIG, add_import_paths, latency_summary, save_results, time_calls
+
+# Micro-benchmarks of the API and ingestion hot paths against recorded fixtures, e.g.
+#   python benchmarks/micro.py                  (no database needed)
+#   python benchmarks/micro.py --db             (adds the Lambda insert path, PG_* -> seeded database)
+# A group whose dependencies aren't installed is reported as skipped instead of failing the run.
+
+add_import_paths()
+# daily_events builds its OpenAI client at import time, the benchmarks never call it
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name)) as f:
+        return f.read()
+
+
+def measure(fn, repeat, items=1):
+    seconds = time_calls(fn, repeat)
+    total = sum(seconds)
+    return {**latency_summary(seconds), "items_per_call": items,
+            "items_per_second": round(items * len(seconds) / total, 1) if total else None}
+
+
+def synthetic_event_rows(n):
+    # shaped like the SELECT in crud.fetch_filtered_events
+    start = date(2015, 1, 1)
+    rows = []
+    for i in range(n):
+        lat, lon = 20 + (i % 150) * 0.1, 70 + (i % 250) * 0.1
+        rows.append((f"SYN{i}", start + timedelta(days=i % 3650), "Battles", "Armed clash", f"Place {i % 500}",
+                     lat, lon, {"type": "Point", "coordinates": [lon, lat]}))
+    return rows
+
+
+def bench_api(repeat):
+    from api.crud import format_geojson
+
+    results = {}
+    for n in (1_000, 10_000):
+        rows = synthetic_event_rows(n)
+        results[f"format_geojson_{n // 1000}k"] = measure(lambda: format_geojson(rows), max(repeat // 10, 3), n)
+    return results
+
+
+def bench_headlines(repeat):
+    from headline_matcher import classify_headlines
+
+    # the labelled corpus kept next to the matcher doubles as the headline fixture
+    with open(os.path.join(REPO_DIR, "data_engineering", "incremental_ingestion", "headline_corpus.jsonl")) as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+    titles = [c["title"] for c in corpus]
+    flags = [c["is_national"] for c in corpus]
+    return {"classify_india_event": measure(lambda: classify_headlines(titles, flags), repeat, len(titles))}
+
+
+def bench_parsing(repeat):
+    from daily_events import parseListingPage, parseArticle, extract_json_from_response
+
+    listing = read_fixture("listing_page.html")
+    article = read_fixture("article_page.html")
+    responses = [json.loads(line) for line in read_fixture("llm_responses.jsonl").splitlines() if line.strip()]
+    texts = [r["response"] for r in responses]
+
+    results = {
+        "parse_listing_page": measure(lambda: parseListingPage(listing), max(repeat // 10, 3)),
+        "parse_article": measure(lambda: parseArticle(article), max(repeat // 10, 3)),
+        "extract_json_from_response": measure(lambda: [extract_json_from_response(t) for t in texts], repeat, len(texts)),
+    }
+    # which recorded response shapes come out as an event, so a parser change shows up as a diff too
+    results["extract_json_from_response"]["parsed_cases"] = {
+        r["case"]: extract_json_from_response(r["response"]) is not None for r in responses
+    }
+    results["parse_listing_page"]["relevant_headlines"] = len(parseListingPage(listing))
+    return results
+
+
+def lambda_payload(n):
+    template = json.loads(read_fixture("ingest_rows.json"))
+    payload = []
+    for i in range(n):
+        row = dict(template[i % len(template)])
+        row["source_url"] = f"https://bench.invalid/lambda/{i}"
+        payload.append(row)
+    return payload
+
+
+def bench_lambda(repeat, use_db, rows):
+    from incremental_ingestion import prepare_rows
+
+    payload = lambda_payload(rows)
+    results = {"lambda_prepare_rows": measure(lambda: prepare_rows(payload), repeat, rows)}
+    if not use_db:
+        return results
+
+    import psycopg2
+    from incremental_ingestion import bulk_insert
+
+    prepared, _ = prepare_rows(payload)
+    conn = psycopg2.connect(**DB_CONFIG)
+    cur = conn.cursor()
+
+    def insert():
+        # rolled back every time so each call inserts the same rows into the same table state,
+        # the insert triggers (defence_events, rollup) still run and are part of the cost
+        try:
+            bulk_insert(cur, prepared)
+        finally:
+            conn.rollback()
+
+    results["lambda_bulk_insert"] = measure(insert, max(repeat // 20, 3), len(prepared))
+    conn.close()
+    return results
+
+
+GROUPS = {
+    "api": lambda args: bench_api(args.repeat),
+    "headlines": lambda args: bench_headlines(args.repeat),
+    "parsing": lambda args: bench_parsing(args.repeat),
+    "lambda": lambda args: bench_lambda(args.repeat, args.db, args.insert_rows),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--groups", nargs="+", choices=list(GROUPS), default=list(GROUPS))
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--db", action="store_true", help="also benchmark the database insert path")
+    parser.add_argument("--insert-rows", type=int, default=1000)
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    results = {}
+    skipped = {}
+    for group in args.groups:
+        try:
+            results.update(GROUPS[group](args))
+        except ImportError as e:
+            print(f"skipping {group}: {e}")
+            skipped[group] = str(e)
+
+    print(f"{'benchmark':<28} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'items/s':>12}")
+    for name, r in results.items():
+        print(f"{name:<28} {r['p50_ms']:>10} {r['p95_ms']:>10} {r['p99_ms']:>10} {r['items_per_second']:>12}")
+
+    if not args.no_save:
+        save_results("micro", results, {"repeat": args.repeat, "db": args.db, "insert_rows": args.insert_rows,
+                                        "groups": args.groups, "skipped": skipped})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import argparse
+import time
+
+import psycopg2
+
+from common import DB_CONFIG
+
+# Seeds acled_history_events / defence_data with synthetic ACLED-shaped rows, generated server side
+# with generate_series so 10M rows don't go through Python. Rows are tagged (SYN* ids, bench.invalid
+# source urls) so --reset removes only them. The same --seed and scale give the same rows, with
+# event dates relative to the day of seeding.
+#   python benchmarks/seed_synthetic.py --rows 1m --defence-rows 10k
+
+SYNTHETIC_SOURCE = "synthetic-benchmark"
+CHUNK_ROWS = 500_000
+
+# (state, district, location, lat, lon); earlier entries are drawn more often, like real hotspots
+PLACES = [
+    ("Jammu and Kashmir", "Srinagar", "Srinagar", 34.08, 74.80),
+    ("Jammu and Kashmir", "Kupwara", "Kupwara", 34.53, 74.25),
+    ("Manipur", "Imphal East", "Imphal", 24.80, 93.95),
+    ("Chhattisgarh", "Bijapur", "Bijapur", 18.80, 80.82),
+    ("Jammu and Kashmir", "Poonch", "Poonch", 33.77, 74.09),
+    ("Chhattisgarh", "Sukma", "Sukma", 18.39, 81.66),
+    ("Jammu and Kashmir", "Pulwama", "Pulwama", 33.87, 74.90),
+    ("Punjab", "Amritsar", "Amritsar", 31.63, 74.87),
+    ("Jharkhand", "West Singhbhum", "Chaibasa", 22.55, 85.80),
+    ("Maharashtra", "Gadchiroli", "Gadchiroli", 20.18, 80.00),
+    ("Assam", "Tinsukia", "Tinsukia", 27.49, 95.36),
+    ("Nagaland", "Mon", "Mon", 26.75, 95.10),
+    ("Delhi", "New Delhi", "New Delhi", 28.61, 77.21),
+    ("Odisha", "Malkangiri", "Malkangiri", 18.35, 81.89),
+    ("Ladakh", "Leh", "Leh", 34.15, 77.58),
+    ("Arunachal Pradesh", "Tawang", "Tawang", 27.59, 91.86),
+]
+EVENT_TYPES = [
+    ("Battles", ["Armed clash", "Government regains territory"]),
+    ("Explosions/Remote violence", ["Remote explosive/landmine/IED", "Shelling/artillery/missile attack"]),
+    ("Strategic developments", ["Arrests", "Disrupted weapons use", "Looting/property destruction"]),
+    ("Violence against civilians", ["Attack", "Abduction/forced disappearance"]),
+]
+ACTORS = ["Military Forces of India", "Police Forces of India", "Unidentified Armed Group (India)",
+          "CPI (Maoist): Communist Party of India (Maoist)", "Military Forces of Pakistan", "Civilians (India)"]
+
+
+def sql_array(values):
+    return "ARRAY[" + ", ".join("'" + str(v).replace("'", "''") + "'" for v in values) + "]"
+
+
+def parse_count(value):
+    value = value.lower().replace("_", "")
+    for suffix, factor in (("k", 1_000), ("m", 1_000_000)):
+        if value.endswith(suffix):
+            return int(float(value[:-1]) * factor)
+    return int(value)
+
+
+def table_columns(cur, table):
+    cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name = %s", (table,))
+    return {r[0] for r in cur.fetchall()}
+
+
+def base_cte(first, last, years):
+    # one row of random draws per generated id, the SELECTs below turn them into columns
+    return f"""
+        WITH base AS (
+            SELECT g,
+                   (floor(power(random(), 2) * {len(PLACES)}) + 1)::int AS p,
+                   (floor(random() * {len(EVENT_TYPES)}) + 1)::int AS t,
+                   (floor(random() * 2) + 1)::int AS s,
+                   (floor(random() * {len(ACTORS)}) + 1)::int AS a1,
+                   (floor(random() * {len(ACTORS)}) + 1)::int AS a2,
+                   (CURRENT_DATE - (random() * 365 * {years})::int) AS d,
+                   (random() - 0.5) * 0.6 AS jlat,
+                   (random() - 0.5) * 0.6 AS jlon,
+                   floor(-ln(1 - random()) * 0.8)::int AS f,
+                   random() AS c
+            FROM generate_series({first}, {last}) g
+        ), placed AS (
+            SELECT base.*,
+                   ({sql_array(p[3] for p in PLACES)}::float8[])[p] + jlat AS lat,
+                   ({sql_array(p[4] for p in PLACES)}::float8[])[p] + jlon AS lon
+            FROM base
+        )
+    """
+
+
+def acled_select(columns):
+    event_types = sql_array(e[0] for e in EVENT_TYPES)
+    sub_event_types = "ARRAY[" + ", ".join(sql_array(e[1][:2]) for e in EVENT_TYPES) + "]"
+    expressions = {
+        "event_id_cnty": "'SYN' || g",
+        "event_date": "d",
+        "year": "EXTRACT(YEAR FROM d)::int",
+        "event_type": f"({event_types})[t]",
+        "sub_event_type": f"({sub_event_types})[t][s]",
+        "actor1": f"({sql_array(ACTORS)})[a1]",
+        "actor2": f"({sql_array(ACTORS)})[a2]",
+        "inter1": "a1",
+        "inter2": "a2",
+        "interaction": "a1 * 10 + a2",
+        "civilian_targeting": "CASE WHEN t = 4 OR c < 0.1 THEN 'Civilian targeting' ELSE '' END",
+        "region": "'South Asia'",
+        "country": "'India'",
+        "admin1": f"({sql_array(p[0] for p in PLACES)})[p]",
+        "admin2": f"({sql_array(p[1] for p in PLACES)})[p]",
+        "location": f"({sql_array(p[2] for p in PLACES)})[p]",
+        "latitude": "lat",
+        "longitude": "lon",
+        "source": f"'{SYNTHETIC_SOURCE}'",
+        "source_scale": "'National'",
+        "notes": "'Synthetic benchmark event ' || g || ' near ' || " + f"({sql_array(p[2] for p in PLACES)})[p]",
+        "fatalities": "f",
+        "timestamp": "EXTRACT(EPOCH FROM d)::bigint",
+        "last_updated": "EXTRACT(EPOCH FROM d)::bigint",
+        "weather_condition": "(ARRAY['Clear', 'Cloudy', 'Rain', 'Fog/Haze'])[(floor(c * 4) + 1)::int]",
+        "temperature": "round((10 + c * 25)::numeric, 2)",
+        "geom": "ST_SetSRID(ST_MakePoint(lon, lat), 4326)",
+    }
+    picked = [c for c in expressions if c in columns]
+    return picked, ", ".join(expressions[c] for c in picked)
+
+
+def defence_select(columns):
+    expressions = {
+        "event_date": "d",
+        "event_type": f"({sql_array(e[0] for e in EVENT_TYPES)})[t]",
+        "actor1": f"({sql_array(ACTORS)})[a1]",
+        "actor2": f"({sql_array(ACTORS)})[a2]",
+        "civilian_targeting": "t = 4 OR c < 0.1",
+        "country": "'India'",
+        "admin1": f"({sql_array(p[0] for p in PLACES)})[p]",
+        "admin2": f"({sql_array(p[1] for p in PLACES)})[p]",
+        "location": f"({sql_array(p[2] for p in PLACES)})[p]",
+        "latitude": "lat",
+        "longitude": "lon",
+        "source": f"'{SYNTHETIC_SOURCE}'",
+        "source_scale": "'national'",
+        "source_url": "'https://bench.invalid/article/' || g",
+        "notes": "'Synthetic benchmark headline ' || g",
+        "fatalities": "f",
+        "weather_condition": "(ARRAY['Clear', 'Cloudy', 'Rain', 'Fog/Haze'])[(floor(c * 4) + 1)::int]",
+        "temperature": "(10 + c * 25)::int",
+        "geom": "ST_SetSRID(ST_MakePoint(lon, lat), 4326)",
+        "timestamp": "EXTRACT(EPOCH FROM d)::bigint",
+    }
+    picked = [c for c in expressions if c in columns]
+    return picked, ", ".join(expressions[c] for c in picked)
+
+
+def seed_table(conn, table, select_builder, rows, years, seed, chunk_rows):
+    cur = conn.cursor()
+    columns, select = select_builder(table_columns(cur, table))
+    column_list = ", ".join(f'"{c}"' for c in columns)
+    loaded = 0
+    for index, first in enumerate(range(1, rows + 1, chunk_rows)):
+        last = min(first + chunk_rows - 1, rows)
+        # reseeded per chunk so a resumed or partial seed produces the same rows
+        cur.execute("SELECT setseed(%s)", (((seed * 7919 + index) % 2000) / 1000.0 - 1,))
+        start = time.perf_counter()
+        cur.execute(f"""
+            {base_cte(first, last, years)}
+            INSERT INTO {table} ({column_list})
+            SELECT {select} FROM placed
+            ON CONFLICT DO NOTHING
+        """)
+        conn.commit()
+        loaded += cur.rowcount
+        print(f"{table}: {last}/{rows} generated, {loaded} inserted ({time.perf_counter() - start:.1f}s)")
+    return loaded
+
+
+def function_exists(cur, name):
+    cur.execute("SELECT 1 FROM pg_proc WHERE proname = %s", (name,))
+    return cur.fetchone() is not None
+
+
+def refresh_derived(conn):
+    # the append triggers were skipped during the load, rebuild the API's tables in one go
+    cur = conn.cursor()
+    for function in ("refresh_defence_events", "rebuild_defence_event_rollup", "bump_data_version"):
+        if function_exists(cur, function):
+            start = time.perf_counter()
+            cur.execute(f"SELECT {function}()")
+            conn.commit()
+            print(f"{function}() took {time.perf_counter() - start:.1f}s")
+    for table in ("acled_history_events", "defence_data", "defence_events", "defence_event_rollup"):
+        cur.execute("SELECT to_regclass(%s)", (table,))
+        if cur.fetchone()[0]:
+            cur.execute(f"ANALYZE {table}")
+    conn.commit()
+
+
+def reset(conn):
+    cur = conn.cursor()
+    cur.execute("DELETE FROM acled_history_events WHERE event_id_cnty LIKE 'SYN%'")
+    print(f"removed {cur.rowcount} synthetic acled rows")
+    cur.execute("DELETE FROM defence_data WHERE source = %s", (SYNTHETIC_SOURCE,))
+    print(f"removed {cur.rowcount} synthetic defence_data rows")
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", default="10k", help="acled_history_events rows, e.g. 10k, 1m, 10m")
+    parser.add_argument("--defence-rows", default=None, help="defence_data rows, defaults to 1%% of --rows")
+    parser.add_argument("--years", type=int, default=10, help="event dates are spread over this many years")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--reset", action="store_true", help="remove synthetic rows before seeding")
+    args = parser.parse_args()
+
+    rows = parse_count(args.rows)
+    defence_rows = parse_count(args.defence_rows) if args.defence_rows else max(rows // 100, 1)
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    cur = conn.cursor()
+    if args.reset:
+        reset(conn)
+    try:
+        # skips the per-statement append / rollup triggers, refresh_derived() rebuilds once at the end
+        cur.execute("SET session_replication_role = replica")
+    except psycopg2.Error as e:
+        conn.rollback()
+        print("can't skip triggers (needs superuser), loading with them enabled:  ", str(e).strip())
+
+    start = time.perf_counter()
+    seed_table(conn, "acled_history_events", acled_select, rows, args.years, args.seed, args.chunk_rows)
+    seed_table(conn, "defence_data", defence_select, defence_rows, args.years, args.seed + 1, args.chunk_rows)
+    cur.execute("SET session_replication_role = origin")
+    conn.commit()
+    refresh_derived(conn)
+    conn.close()
+    print(f"seeded {rows} acled and {defence_rows} defence_data rows in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import os
+import json
+import time
+import argparse
+
+from headline_matcher import event_kw, classify_india_event, classify_headlines
+
+# Accuracy and throughput of the headline pre-filter against the labelled corpus, e.g.
+#   python bench_headline_matcher.py --repeat 500
+# the word-set matcher it replaced is kept below as the baseline
+
+
+def legacy_classify_india_event(article_text: str, is_national:False) -> str | None:
+    text = set(article_text.lower().split())
+
+    if any(k in text for k in event_kw["strategic"]) and (is_national or any(c in text for c in event_kw["india_context"])):
+        return "Strategic developments"
+
+    if any(k in text for k in event_kw["battle"]) and (is_national or any(c in text for c in event_kw["india_context"])):
+        return "Battles"
+
+    if any(k in text for k in event_kw["explosion"]) and (is_national or any(c in text for c in event_kw["india_context"])):
+        return "Explosions / Remote violence"
+
+    if any(k in text for k in event_kw["civilian"]) and any(c in text for c in event_kw["military_or_terror_link"]):
+        return "Violence against civilians"
+
+    return None
+
+
+def load_corpus(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def run(name, classify, titles, flags, expected, repeat):
+    predictions = classify(titles, flags)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        classify(titles, flags)
+    seconds = time.perf_counter() - start
+    headlines = len(titles) * repeat
+    return {
+        "matcher": name,
+        "accuracy": round(sum(p == e for p, e in zip(predictions, expected)) / len(titles), 3),
+        # a headline counts as relevant when it gets any label, that's what decides whether BART sees it
+        "relevance_accuracy": round(sum((p is None) == (e is None) for p, e in zip(predictions, expected)) / len(titles), 3),
+        "headlines_per_second": round(headlines / seconds),
+        "predictions": predictions,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "headline_corpus.jsonl"))
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--output")
+    parser.add_argument("--show-misses", action="store_true")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.input)
+    titles = [c["title"] for c in corpus]
+    flags = [c.get("is_national", False) for c in corpus]
+    expected = [c.get("label") for c in corpus]
+
+    legacy = lambda t, f: [legacy_classify_india_event(title, flag) for title, flag in zip(t, f)]
+    results = [
+        run("word-set", legacy, titles, flags, expected, args.repeat),
+        run("compiled", classify_headlines, titles, flags, expected, args.repeat),
+    ]
+
+    print(f"{'matcher':<10} {'acc':>7} {'rel acc':>8} {'headlines/s':>12}")
+    for r in results:
+        print(f"{r['matcher']:<10} {r['accuracy']:>7} {r['relevance_accuracy']:>8} {r['headlines_per_second']:>12}")
+
+    if args.show_misses:
+        for title, flag, label in zip(titles, flags, expected):
+            predicted = classify_india_event(title, flag)
+            if predicted != label:
+                print(f"  expected {label!r:<32} got {predicted!r:<32} {title}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import os
+import sys
+import tempfile
+
+# Checks that the run report's cache hit rates count one hit or miss per logical lookup:
+# a cold run over a fresh cache must report 0 for every namespace, the same run again 1.0.
+#   python check_cache_hit_rates.py
+# The network edges (article fetch, model, LLM, Nominatim, Open-Meteo) are answered locally.
+
+workdir = tempfile.mkdtemp(prefix="cache_check_")
+os.environ["INGESTION_CACHE_PATH"] = os.path.join(workdir, "ingestion_cache.sqlite")
+os.environ["GAZETTEER_PATH"] = os.path.join(workdir, "no_gazetteer.sqlite")
+
+import geocoder
+import weather
+import ingestion_cache
+from ingestion_cache import get_cache, cached_article, cached_classification, cached_extraction
+from run_metrics import cache_hit_rates
+
+URLS = ["https://example.invalid/a", "https://example.invalid/b"]
+TEXTS = ["Army foils infiltration bid along LoC", "Grenade attack in Srinagar market"]
+# distinct places: a repeat within the cold run would be a genuine hit; the second weather point repeats on purpose,
+# a batch reads each key once
+PLACES = [("Kupwara", "Kupwara", "Jammu and Kashmir"), ("Nowhere", None, None)]
+POINTS = [(34.53, 74.25, "2024-01-05"), (34.53, 74.25, "2024-01-05"), (24.80, 93.95, "2024-02-01")]
+
+
+def fake_cell_range(job):
+    (lat, lon), (start, end) = job
+    days = [start.isoformat()] if start == end else [start.isoformat(), end.isoformat()]
+    return (lat, lon), {"time": days, "weathercode": [1] * len(days),
+                        "temperature_2m_max": [30] * len(days), "temperature_2m_min": [20] * len(days)}
+
+
+def run_once():
+    for url in URLS:
+        cached_article(url, lambda u: "article text for " + u)
+    cached_classification(TEXTS, "check", lambda contents: [("label", 0.9) for _ in contents])
+    for text in TEXTS:
+        cached_extraction(text, "check", lambda article: ("{}", {"location": "Kupwara"}))
+    for place in PLACES:
+        geocoder.geocode(*place)
+    weather.enrich_weather(POINTS)
+    return cache_hit_rates(get_cache().stats())
+
+
+def main():
+    geocoder.nominatim_search = lambda query: {"lat": 34.53, "lon": 74.25} if query.startswith("Kupwara") else None
+    weather._fetch_cell_range = fake_cell_range
+    weather.map_concurrent = lambda fn, jobs: [fn(job) for job in jobs]
+
+    cold = run_once()
+    # a new cache object on the same file: warm data, fresh counters
+    get_cache().close()
+    ingestion_cache._cache = None
+    warm = run_once()
+
+    failures = []
+    for namespace in ("article", "bart", "llm", "geocode", "weather"):
+        if cold.get(namespace, {}).get("hit_rate") != 0:
+            failures.append(f"cold run {namespace}: {cold.get(namespace)}")
+        if warm.get(namespace, {}).get("hit_rate") != 1:
+            failures.append(f"warm run {namespace}: {warm.get(namespace)}")
+    print("cold:", cold)
+    print("warm:", warm)
+    for failure in failures:
+        print("FAIL", failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener
+
+from event_classifier import (
+    CLASSIFIER_SERVER_HOST, CLASSIFIER_SERVER_PORT, server_authkey, get_classifier, score_batch_local
+)
+
+# Keeps the zero-shot model warm between daily runs:
+#   python data_engineering/incremental_ingestion/classifier_server.py &
+# daily_events.py connects to it automatically and falls back to loading the model itself if it is not running.
+# Clients authenticate with CLASSIFIER_SERVER_AUTHKEY, or with the random key the server writes to
+# .cache/classifier_server.key on first start.
+
+
+def serve():
+    authkey = server_authkey(create=True)
+    get_classifier()
+    print(f"classifier server listening on {CLASSIFIER_SERVER_HOST}:{CLASSIFIER_SERVER_PORT}")
+    with Listener((CLASSIFIER_SERVER_HOST, CLASSIFIER_SERVER_PORT), authkey=authkey) as listener:
+        while True:
+            try:
+                with listener.accept() as conn:
+                    request = conn.recv()
+                    try:
+                        scores = score_batch_local(request["contents"], request["batch_size"])
+                        conn.send({"scores": scores})
+                    except Exception as e:
+                        print("classification failed:  ", e)
+                        conn.send({"error": str(e)})
+            except (EOFError, OSError, AuthenticationError) as e:
+                print("classifier server connection error:  ", e)
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,70 @@
+import argparse
+import json
+import time
+
+from event_classifier import DEFAULT_MODELS, CLASSIFIER_BATCH_SIZE, build_classifier, score_batch_local, to_event_label
+
+# Accuracy vs latency comparison of the classifier backends, e.g.
+#   python compare_classifiers.py --input samples.jsonl --backends pipeline int8 onnx distilled
+# samples.jsonl has one {"text": ..., "label": ...} per line; "label" (one of the event types, or null for
+# not relevant) is optional. Agreement is measured against the first backend, which should be the current one.
+
+
+def load_samples(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def run_backend(backend, texts, batch_size):
+    start = time.perf_counter()
+    classifier = build_classifier(backend)
+    load_seconds = time.perf_counter() - start
+
+    # one warm-up call so lazy initialisation isn't counted as inference
+    score_batch_local(texts[:1], batch_size, classifier)
+
+    start = time.perf_counter()
+    scores = score_batch_local(texts, batch_size, classifier)
+    infer_seconds = time.perf_counter() - start
+    return {
+        "backend": backend,
+        "model": DEFAULT_MODELS[backend],
+        "load_seconds": round(load_seconds, 2),
+        "infer_seconds": round(infer_seconds, 2),
+        "ms_per_item": round(infer_seconds * 1000 / len(texts), 1),
+        "predictions": [to_event_label(label, score) for label, score in scores],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", required=True)
+    parser.add_argument("--backends", nargs="+", default=list(DEFAULT_MODELS))
+    parser.add_argument("--batch-size", type=int, default=CLASSIFIER_BATCH_SIZE)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    samples = load_samples(args.input)
+    texts = [s["text"] for s in samples]
+    expected = [s.get("label") for s in samples]
+    has_labels = any("label" in s for s in samples)
+
+    results = [run_backend(backend, texts, args.batch_size) for backend in args.backends]
+    baseline = results[0]["predictions"]
+    for result in results:
+        predictions = result["predictions"]
+        result["agreement_with_baseline"] = round(sum(p == b for p, b in zip(predictions, baseline)) / len(texts), 3)
+        if has_labels:
+            result["accuracy"] = round(sum(p == e for p, e in zip(predictions, expected)) / len(texts), 3)
+
+    print(f"{'backend':<10} {'load s':>8} {'ms/item':>8} {'agree':>7} {'acc':>7}")
+    for r in results:
+        print(f"{r['backend']:<10} {r['load_seconds']:>8} {r['ms_per_item']:>8} {r['agreement_with_baseline']:>7} {r.get('accuracy', '-'):>7}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,23 @@
 import os
+import argparse
+import threading
 import requests
 from bs4 import BeautifulSoup
 import json
 import re
-from transformers import pipeline
 from openai import OpenAI
 from supabase import create_client, Client
+from http_client import http_get, map_concurrent, HTTP_MAX_WORKERS
+from headline_matcher import classify_india_event
+from event_classifier import CLASSIFIER_BATCH_SIZE, classifier_cache_key, score_batch, to_event_label
+from dedup import KnownEvents
+from geocoder import geocode
+from weather import enrich_weather
+from llm_scheduler import LLMScheduler, LLM_MAX_CONCURRENCY
+from ingestion_cache import get_cache, cached_article, cached_classification, cached_extraction
+from pipeline_state import PipelineState
+from streaming import Stage, StreamPipeline, STREAM_BATCH_LINGER
+from run_metrics import metrics, cache_hit_rates
 
 openrouter_base_url = os.getenv("OPENROUTER_BASE_URL")
 openrouter_api_key = os.getenv("OPENROUTER_API_KEY")
@@ -13,104 +25,46 @@ supabase_url = os.getenv("SUPABASE_URL")
 supabase_key = os.getenv("SUPABASE_KEY")
 web_url = os.getenv("WEB_URL")
 
-classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
+# retries and fallbacks are owned by LLMScheduler, which needs to see every 429 per model
 client = OpenAI(
   base_url=openrouter_base_url,
   api_key=openrouter_api_key,
+  max_retries=0,
 )
 
-# labels for bart model
-labels = {
-    "A bombing or explosion occurred": "Explosions / Remote violence",
-    "A military or armed battle happened": "Battles",
-    "A military strategic decision or deployment occurred": "Strategic developments",
-    "Civilians were attacked or harmed and related to army and terrorist": "Violence against civilians",
-    "This is not related to violence or military events": "Other"
-}
-
-# Filter relevent articles based on headline
-event_kw = {
-    # India-specific geo and actor context
-    "india_context" : [
-        "india", "indian", "jammu", "kashmir", "ladakh", "manipur", "pulwama", "uri","delhi",
-        "shopian", "baramulla", "srinagar", "poonch", "northeast","kulgam","jammu",
-        "bsf", "crpf", "iaf", "drdo","isro", "rashtriya rifles", "loc", "lac", "modi"
-    ],
-
-    # Strategic Developments 
-    "strategic" : [
-        "deployment", "military exercise", "war game", "missile test", "satellite launch",
-        "defense deal", "arms procurement", "strategic partnership", "drdo",
-        "joint drill", "air defence", "naval exercise", "border monitoring", "spy satellite","evacuation", 
-        "emabssy","launched","ceasefire", "coastal","coastal security","coastal deployment", "security"
-    ],
-
-    #  Battles
-    "battle" : [
-        "firing", "gunfire", "skirmish", "encounter", "cross-border", "ambush", "mortar shelling",
-        "sniper fire", "air strike", "surgical strike", "border clash","army","air force","navy", 
-        "coast guard"
-    ],
-
-    # Explosions / Remote Violence 
-    "explosion" : [
-        "blast", "ied", "explosion", "bomb", "grenade attack", "remote detonation",
-        "landmine", "sabotage"
-    ],
-
-    # Violence Against Civilians
-    "civilian" : [
-        "civilian killed", "villager killed", "innocent killed", "bystander", "mob lynching",
-        "school attacked", "massacre", "hostage", "student killed", "bus attacked"
-    ],
-    "military_or_terror_link" : [
-        "terrorist", "militant", "naxal", "maoist", "encounter", "crpf", "bsf", "army", "jawan"
-    ]
-}
-
-event_kwd_map = {
-    "Strategic developments": "strategic",
-    "Battles": "battle",
-    "Explosions / Remote violence":"explosion",
-    "Violence against civilians": "civilian"                       
-}
-
-
-def classify_india_event(article_text: str, is_national:False) -> str | None:
-    text = set(article_text.lower().split())
-    
-    if any(k in text for k in event_kw["strategic"]) and (is_national or any(c in text for c in event_kw["india_context"])):
-        return "Strategic developments"
-
-    if any(k in text for k in event_kw["battle"]) and (is_national or any(c in text for c in event_kw["india_context"])):
-        return "Battles"
-
-    if any(k in text for k in event_kw["explosion"]) and (is_national or any(c in text for c in event_kw["india_context"])):
-        return "Explosions / Remote violence"
+def fetchListingPage(page: int):
+    try:
+        response = http_get(web_url + str(page))
+        response.raise_for_status()
+        return response.text
+    except Exception as e:
+        print(f"Falied to get listing page {page}", e)
 
-    if any(k in text for k in event_kw["civilian"]) and any(c in text for c in event_kw["military_or_terror_link"]):
-        return "Violence against civilians"
 
-    return None  # No relevant Indian military event found
+def parseListingPage(page_html: str):
+    links = []
+    soup = BeautifulSoup(page_html, "html.parser")
+    for li in soup.find_all('li'):
+        title_element = li.find('h3', class_='title')
+        time_element = soup.find('div', class_='news-time time')
+        if title_element and time_element:
+            link = title_element.a['href']
+            if link.split("/")[3] in ['politics','news','the-nation']:
+                published_time = time_element['data-published']
+                title = title_element.a.get_text(strip=True)
+                class_name = classify_india_event(title, link.split("/")[4] == 'national' )
+                if class_name:
+                    links.append((link,title, published_time))
+    return links
 
 
 def getLatestHeadlines():
     links = []
+    pages = map_concurrent(fetchListingPage, range(0, 15))
     try:
-        for page in range(0, 15):
-            response = requests.get(web_url + str(page))
-            soup = BeautifulSoup(response.text, "html.parser")
-            for li in soup.find_all('li'):
-                title_element = li.find('h3', class_='title')
-                time_element = soup.find('div', class_='news-time time')
-                if title_element and time_element:
-                    link = title_element.a['href']
-                    if link.split("/")[3] in ['politics','news','the-nation']:
-                        published_time = time_element['data-published']
-                        title = title_element.a.get_text(strip=True)
-                        class_name = classify_india_event(title, link.split("/")[4] == 'national' )
-                        if class_name:
-                            links.append((link,title, published_time))
+        for page_html in pages:
+            if page_html:
+                links += parseListingPage(page_html)
     except Exception as e:
         print("Falied to get latest headlines",e)
         
@@ -123,45 +77,55 @@ def getLatestHeadlines():
     return list(latest_entries.values())
 
 
-def fetchArticle(url: str) -> str|None:
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
+def parseArticle(html: str) -> str|None:
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Extract content (combining all <p> tags inside the article body)
+    article_body = soup.find('div', class_='articlebodycontent')
+    if article_body:
+        paragraphs = article_body.find_all('p')
+        text = ' '.join([p.get_text(strip=True) for p in paragraphs if p.get_text(strip=True)])
+        return re.sub(r'\s+', ' ', text).strip()
+    return None
+
 
+def fetchArticle(url: str) -> str|None:
     try:
-        response = requests.get(url, headers=headers)
+        response = http_get(url)
         response.raise_for_status() 
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # Extract content (combining all <p> tags inside the article body)
-        article_body = soup.find('div', class_='articlebodycontent')
-        if article_body:
-            paragraphs = article_body.find_all('p')
-            text = ' '.join([p.get_text(strip=True) for p in paragraphs if p.get_text(strip=True)])
-            return re.sub(r'\s+', ' ', text).strip()
-        else:
+        text = parseArticle(response.text)
+        if text is None:
             print("No content found")
-            return None
+            metrics.error("article", "no_content")
+        return text
 
     except requests.exceptions.RequestException as e:
         print(json.dumps({"error": f"Failed to fetch the article: {str(e)}"}, indent=2))
+        metrics.error("article", e)
 
     except Exception as e:
         print(json.dumps({"error": f"An error occurred: {str(e)}"}, indent=2))
+        metrics.error("article", e)
     
     return None
 
 
+def fetchArticleCached(url: str) -> str|None:
+    return cached_article(url, fetchArticle)
+
+
 def bart_events_classifier(content: str):
-    result = classifier(
-        content,
-        list(labels.keys())
-    )
-    if result['scores'][0]>0.4 and result['labels'][0] and labels[result['labels'][0]]!= 'Other':
-        return labels[result['labels'][0]]
+    return bart_events_classifier_batch([content])[0]
+
+
+def bart_events_classifier_batch(contents: list):
+    metrics.count("classifier_items_total", len(contents))
+    with metrics.timer("classifier_batch_seconds"):
+        scores = cached_classification(contents, classifier_cache_key(), score_batch)
+    return [to_event_label(label, score) for label, score in scores]
 
 
-def openrouter_data(model: str, fallback_models:list, article:str):
+def openrouter_request(model: str, article:str):
     prompt = """
         Extract the most recent real-world defense, military, or terrorism-related event from the article below.
         Only return if the event is directly related to India (i.e., occurred in India or involved Indian citizens as direct victims or actors). Ignore background or contextual info.
@@ -182,12 +146,9 @@ def openrouter_data(model: str, fallback_models:list, article:str):
         article:
      """ + article
 
-    try:
+    with metrics.timer("llm_request_seconds", model=model):
         completion = client.chat.completions.create(
           model=model,
-          extra_body={
-              "models": fallback_models
-          },
           messages=[
             {
               "role": "user",
@@ -195,7 +156,12 @@ def openrouter_data(model: str, fallback_models:list, article:str):
             }
           ]
         )
-        return completion.choices[0].message.content
+    return completion.choices[0].message.content
+
+
+def openrouter_data(model: str, article:str):
+    try:
+        return openrouter_request(model, article)
     except Exception as e:
         print("openrouter error:  ",e)
         
@@ -210,151 +176,383 @@ def extract_json_from_response(response_text):
                 return json.loads(json_text)
         except Exception as e:
             print("JSON Decode Error:", e)
+            metrics.error("llm_json", e)
 
-def getLatLongFromLocation(location: str):
-    headers = { 'User-Agent': 'MyGeocoder/1.0 (me@example.com)' }
-    try:
-        response = requests.get(
-            f"https://nominatim.openstreetmap.org/search?format=json&q={location}",
-            headers=headers
-        )
-        if response.status_code == 200:
-            data = response.json()
-            return {
-                "lat": float(data[0]["lat"]),
-                "lon": float(data[0]["lon"])
-            }
+def extract_event_data(model: str, fallback_models: list, article: str):
+    return extract_events_data(model, fallback_models, [article])[0]
 
-    except Exception as e:
-        print("getLatLongFromLocation error:  ",getLatLongFromLocation)
-    return {"lat": None,"lon": None}
-    
+def extract_events_data(model: str, fallback_models: list, articles: list, scheduler: LLMScheduler = None):
+    # concurrent, rate-limit aware extraction routed across model + fallback_models, see llm_scheduler.py
+    own_scheduler = scheduler is None
+    scheduler = scheduler or LLMScheduler([model] + fallback_models)
+
+    def extract(text):
+        response = scheduler.complete(lambda m: openrouter_request(m, text))
+        return response, extract_json_from_response(response)
 
-def get_simplified_weather_condition(weather_code):
-    if weather_code is None:
-        return "Unknown"
-    elif weather_code == 0:
-        return "Clear"
-    elif 1 <= weather_code <= 3:
-        return "Cloudy"
-    elif 45 <= weather_code <= 48:
-        return "Fog/Haze"
-    elif 51 <= weather_code <= 67:
-        return "Rain"
-    elif 71 <= weather_code <= 77:
-        return "Snow"
-    elif 80 <= weather_code <= 86:
-        return "Rain"
-    elif 95 <= weather_code <= 99:
-        return "Thunderstorm"
-    else:
-        return "Extreme"
+    results = map_concurrent(lambda article: cached_extraction(article, model, extract), articles,
+                             max_workers=LLM_MAX_CONCURRENCY)
+    if own_scheduler:
+        print("openrouter model stats:  ", scheduler.report())
+    return results
+
+def getLatLongFromLocation(location: str, admin2: str = None, admin1: str = None):
+    # cache -> offline gazetteer -> Nominatim, see geocoder.py
+    return geocode(location, admin2, admin1)
+    
 
 def fetch_weather(lat, lon, date):
-    url = "https://archive-api.open-meteo.com/v1/archive"
-    params = {
-        "latitude": lat,
-        "longitude": lon,
-        "start_date": date,
-        "end_date": date,
-        "daily": "weathercode,temperature_2m_max,temperature_2m_min",
-        "timezone": "auto"
-    }
+    return fetch_weather_batch([(lat, lon, date)])[0]
 
+def fetch_weather_batch(points: list):
+    # grid-cell batched and cached, see weather.py
+    return [
+        {"max_temp": w["max_temp"], "min_temp": w["min_temp"], "weather_condition": w["weather_condition"]}
+        for w in enrich_weather(points)
+    ]
+
+def load_known_events():
     try:
-        res = requests.get(url, params=params, timeout=10)
-        if res.status_code == 200:
-            data = res.json().get("daily", {})
-            return {
-                "max_temp": float(data.get("temperature_2m_max", [None])[0]),
-                "min_temp": float(data.get("temperature_2m_min", [None])[0]),
-                "weather_condition": get_simplified_weather_condition(int(data.get("weathercode", [None])[0]))
-            }
+        return KnownEvents().load(create_client(supabase_url, supabase_key))
     except Exception as e:
-        print("fetch_weather error:  ",e)
-
-    return {
-        "max_temp": None,
-        "min_temp": None,
-        "weather_condition": None
-    }
-
-def prepare_final_data(latestNews: list, model:str, fallback_models:list):
-    i=0
-    finalData = []
-    for link_det in latestNews:
-        i+=1
-        print("executing task: ", i)
-        title = link_det[1]
-        article = fetchArticle(link_det[0])
-        event = bart_events_classifier(title + '. ' + article[:500])
-    
-        if event:
-            # llm_data = {'event_date': '2025-06-29', 'actor1': 'Sri Lankan Navy', 'actor2': 'Indian fishermen', 'country': 'India', 'admin1': 'Tamil Nadu', 'admin2': 'Ramanathapuram', 'location': 'Dhanushkodi', 'fatalities': 0, 'civilian_targeting': 1}
-            llm_data = extract_json_from_response(openrouter_data(model,fallback_models,article))
-            print(f"llm_data for task {i}::", llm_data)
-            if llm_data:
-                final_loc = ', '.join(filter(None, [llm_data['location'], llm_data['admin2'], llm_data['admin1']]))
-                coords = getLatLongFromLocation(final_loc)
-                
-                weather_data = fetch_weather(coords["lat"], coords["lon"], llm_data["event_date"]) if coords["lat"] and coords["lon"] else {"max_temp": None,"min_temp": None,"weather_condition": None }
-                
-                article_info = {"source_url":link_det[0],
-                        "source": "The Hindu",
-                        "source_scale": "national",
-                        "notes":link_det[1],
-                        "event_type": event,
-                        "event_date": llm_data.get("event_date", link_det[2]),
-                        "country": llm_data.get("country", "India"),
-                        "actor1": llm_data.get("actor1", None),
-                        "actor2": llm_data.get("actor2",None),
-                        "admin1": llm_data.get("admin1",None),
-                        "admin2": llm_data.get("admin2",None),
-                        "location": llm_data.get("location",None),  
-                        "fatalities": llm_data.get("fatalities",0),
-                        "civilian_targeting": llm_data.get("civilian_targeting",0),
-                        "latitude": coords["lat"] ,
-                        "longitude":coords["lon"] ,
-                        "weather_condition": weather_data["weather_condition"],
-                        "max_temp": weather_data["max_temp"],
-                        "min_temp": weather_data["min_temp"]
-                       }
-                finalData.append(article_info)
-                # break
-    return finalData
-    
+        print("failed to load already ingested events:  ", e)
+        metrics.error("known_events", e)
+        return KnownEvents()
+
+
+def build_row(item: dict) -> dict:
+    llm_data, coords, weather_data = item["llm_data"], item["coords"], item["weather"]
+    return {"source_url":item["url"],
+            "source": "The Hindu",
+            "source_scale": "national",
+            "notes":item["title"],
+            "event_type": item["event"],
+            "event_date": llm_data.get("event_date", item["published"]),
+            "country": llm_data.get("country", "India"),
+            "actor1": llm_data.get("actor1", None),
+            "actor2": llm_data.get("actor2",None),
+            "admin1": llm_data.get("admin1",None),
+            "admin2": llm_data.get("admin2",None),
+            "location": llm_data.get("location",None),
+            "fatalities": llm_data.get("fatalities",0),
+            "civilian_targeting": llm_data.get("civilian_targeting",0),
+            "latitude": coords["lat"] ,
+            "longitude":coords["lon"] ,
+            "weather_condition": weather_data["weather_condition"],
+            "max_temp": weather_data["max_temp"],
+            "min_temp": weather_data["min_temp"]
+           }
+
+
+# Each stage reads the items the previous one finished from the checkpoint db (pipeline_state.py),
+# and records per item whether it advanced, was skipped or failed. A crash loses at most the
+# batch in flight, the next run carries on from the last completed stage of every item.
+# The *_items functions take a batch of (url, item) and return one entry per input, the advanced
+# (url, item) or None; run_pipeline feeds them whole stages, run_streaming overlaps them (streaming.py).
+
+_known_events_lock = threading.Lock()
+
+
+def scrape_items(state: PipelineState, known_events: KnownEvents):
+    latestNews = getLatestHeadlines()
+    print("latestNews:  ",latestNews)
+    print(f"{state.add_headlines(latestNews)} new headlines")
+    # drop articles a previous run already inserted before any expensive step
+    items = []
+    for url, item in state.pending("scraped"):
+        if known_events.seen_url(url):
+            state.skip(url, "already ingested")
+        else:
+            items.append((url, item))
+    return items
+
+
+def fetch_items(state: PipelineState, items: list):
+    articles = map_concurrent(fetchArticleCached, [url for url, _ in items])
+    results = []
+    for (url, item), article in zip(items, articles):
+        if not article:
+            state.fail(url, "no article text")
+            results.append(None)
+            continue
+        item = {**item, "article": article}
+        state.advance(url, item, "fetched")
+        results.append((url, item))
+    return results
+
+
+def classify_items(state: PipelineState, items: list):
+    # one batched classification pass over every candidate instead of one model call per article
+    try:
+        events = bart_events_classifier_batch([item["title"] + '. ' + item["article"][:500] for _, item in items])
+    except Exception as e:
+        print("classification failed:  ", e)
+        metrics.error("classify", e)
+        for url, _ in items:
+            state.fail(url, e)
+        return [None] * len(items)
+    results = []
+    for (url, item), event in zip(items, events):
+        if not event:
+            state.skip(url, "not a defence event")
+            results.append(None)
+            continue
+        item = {**item, "event": event}
+        state.advance(url, item, "classified")
+        results.append((url, item))
+    return results
+
+
+def extract_items(state: PipelineState, items: list, model: str, fallback_models: list, scheduler: LLMScheduler = None):
+    # a failed call isn't cached so it's retried next run
+    extracted = extract_events_data(model, fallback_models, [item["article"] for _, item in items], scheduler)
+    results = []
+    for (url, item), llm_data in zip(items, extracted):
+        # llm_data = {'event_date': '2025-06-29', 'actor1': 'Sri Lankan Navy', 'actor2': 'Indian fishermen', 'country': 'India', 'admin1': 'Tamil Nadu', 'admin2': 'Ramanathapuram', 'location': 'Dhanushkodi', 'fatalities': 0, 'civilian_targeting': 1}
+        print(f"llm_data for {url}::", llm_data)
+        if not llm_data:
+            state.fail(url, "no event extracted")
+            results.append(None)
+            continue
+        item = {**item, "llm_data": llm_data}
+        state.advance(url, item, "extracted")
+        results.append((url, item))
+    return results
+
+
+def remember_pending_events(state: PipelineState, known_events: KnownEvents):
+    # events located by an earlier run but not inserted yet still count for the fuzzy dedupe
+    for stage in ("located", "enriched"):
+        for _, item in state.pending(stage):
+            known_events.add({**item["llm_data"], "event_type": item["event"]})
+
+
+def locate_items(state: PipelineState, items: list, known_events: KnownEvents):
+    results = []
+    for url, item in items:
+        event = {**item["llm_data"], "event_type": item["event"]}
+        with _known_events_lock:
+            duplicate = known_events.seen_event(event)
+            if not duplicate:
+                known_events.add(event)
+        if duplicate:
+            state.skip(url, "duplicates an already ingested event")
+            results.append(None)
+            continue
+        llm_data = item["llm_data"]
+        coords = getLatLongFromLocation(llm_data.get('location'), llm_data.get('admin2'), llm_data.get('admin1'))
+        item = {**item, "coords": coords}
+        state.advance(url, item, "located")
+        results.append((url, item))
+    return results
+
+
+def enrich_items(state: PipelineState, items: list):
+    # weather for the whole batch in one pass, grouped by grid cell and date range
+    weather = fetch_weather_batch([(item["coords"]["lat"], item["coords"]["lon"], item["llm_data"].get("event_date"))
+                                   for _, item in items])
+    results = []
+    for (url, item), weather_data in zip(items, weather):
+        item = {**item, "url": url, "weather": weather_data}
+        item["row"] = build_row(item)
+        state.advance(url, item, "enriched")
+        results.append((url, item))
+    return results
+
+
+def insert_items(state: PipelineState, items: list):
+    final_data = [item["row"] for _, item in items]
+    print("data to be inserted:   ",final_data)
+    result = insert_data(final_data)
+    print("data inserted successfully--------------", result)
+    errors = {e["source_url"]: e["error"] for e in result["errors"]}
+    results = []
+    for url, item in items:
+        if url in errors:
+            state.fail(url, errors[url])
+            results.append(None)
+            continue
+        state.advance(url, item, "inserted")
+        results.append((url, item))
+    return results
+
+
+SUPABASE_INSERT_CHUNK_SIZE = int(os.getenv("SUPABASE_INSERT_CHUNK_SIZE", "500"))
+# when streaming, rows are held this long to fill an insert chunk
+STREAM_INSERT_LINGER = float(os.getenv("STREAM_INSERT_LINGER", "10"))
+
+def upsert_rows(supabase, rows: list):
+    # rows that hit the source_url constraint are ignored and not returned, so len(data) is the inserted count
+    response = (
+        supabase.table("defence_data")
+        .upsert(rows, on_conflict="source_url", ignore_duplicates=True)
+        .execute()
+    )
+    return len(response.data or [])
+
 
 def insert_data(final_data):
-    
+    # one request per chunk instead of one per row; a failing chunk is retried row by row
+    # so the bad rows can be reported
+    inserted = 0
+    done = 0
+    errors = []
     try:
         supabase: Client = create_client(supabase_url, supabase_key)
-        for data in final_data:
+        for start in range(0, len(final_data), SUPABASE_INSERT_CHUNK_SIZE):
+            chunk = final_data[start:start + SUPABASE_INSERT_CHUNK_SIZE]
             try:
-                response = (
-                    supabase.table("defence_data")
-                    .insert(data)
-                    .execute()
-                )
+                inserted += upsert_rows(supabase, chunk)
+                done = start + len(chunk)
+                continue
             except Exception as e:
-                print("failed to insert for:  ", e)
+                print("failed to insert chunk, retrying row by row:  ", e)
+
+            for data in chunk:
+                try:
+                    inserted += upsert_rows(supabase, [data])
+                except Exception as e:
+                    print("failed to insert for:  ", e)
+                    metrics.error("insert", e)
+                    errors.append({"source_url": data.get("source_url"), "error": str(e)})
+            done = start + len(chunk)
+
+        # lets the API drop cached responses built from the previous data
+        if inserted:
+            supabase.rpc("bump_data_version").execute()
         
     except Exception as e:
         print("Error while inserting data:  ",e)
+        metrics.error("insert", e)
+        # rows never sent are reported as failed so the caller can retry them
+        errors += [{"source_url": data.get("source_url"), "error": str(e)} for data in final_data[done:]]
+
+    print(f"inserted {inserted} of {len(final_data)} rows, {len(errors)} failed")
+    metrics.count("rows_inserted_total", inserted)
+    return {"inserted": inserted, "duplicates": len(final_data) - inserted - len(errors), "errors": errors}
+
+
+STAGE_NAMES = ["scrape", "fetch", "classify", "extract", "locate", "enrich", "insert"]
+# checkpoint stage an item has to be at to enter each processing stage
+STAGE_INPUTS = {"fetch": "scraped", "classify": "fetched", "extract": "classified",
+                "locate": "extracted", "enrich": "located", "insert": "enriched"}
+
+
+def run_pipeline(state: PipelineState, model: str, fallback_models: list, stages: list = None):
+    # one stage at a time over everything waiting for it
+    stages = stages or STAGE_NAMES
+    known_events = load_known_events() if {"scrape", "locate"} & set(stages) else KnownEvents()
+    remember_pending_events(state, known_events)
+    for stage in stages:
+        if stage == "scrape":
+            with metrics.timer("stage_batch_seconds", stage="scrape"):
+                scrape_items(state, known_events)
+        else:
+            items = state.pending(STAGE_INPUTS[stage])
+            if stage == "insert" and not items:
+                print("no data to insert----------")
+            elif items:
+                run_stage_batch(stage, state, items, model, fallback_models, known_events)
+        print(f"after {stage}:  ", state.counts())
+
+
+def run_stage_batch(stage, state, items, model, fallback_models, known_events, scheduler=None):
+    # per item: in = handed to the stage, out = advanced to the next one (the rest were skipped or failed)
+    metrics.count("stage_items_in_total", len(items), stage=stage)
+    with metrics.timer("stage_batch_seconds", stage=stage):
+        results = _run_stage_batch(stage, state, items, model, fallback_models, known_events, scheduler)
+    metrics.count("stage_items_out_total", sum(r is not None for r in results), stage=stage)
+    return results
+
+
+def _run_stage_batch(stage, state, items, model, fallback_models, known_events, scheduler=None):
+    if stage == "fetch":
+        return fetch_items(state, items)
+    if stage == "classify":
+        return classify_items(state, items)
+    if stage == "extract":
+        return extract_items(state, items, model, fallback_models, scheduler)
+    if stage == "locate":
+        return locate_items(state, items, known_events)
+    if stage == "enrich":
+        return enrich_items(state, items)
+    return insert_items(state, items)
+
+
+def run_streaming(state: PipelineState, model: str, fallback_models: list):
+    # all stages at once, connected by bounded queues: articles are fetched while BART scores earlier
+    # ones and the LLM works on the ones before that, so the run takes about as long as its slowest stage
+    with metrics.timer("load_known_events_seconds"):
+        known_events = load_known_events()
+    remember_pending_events(state, known_events)
+    scheduler = LLMScheduler([model] + fallback_models)
+
+    def stage(name, workers=1, batch_size=1, linger=STREAM_BATCH_LINGER):
+        fn = lambda batch: run_stage_batch(name, state, batch, model, fallback_models, known_events, scheduler)
+        return Stage(name, fn, workers, batch_size, linger)
+
+    pipeline = StreamPipeline([
+        stage("fetch", workers=HTTP_MAX_WORKERS),
+        # a single dedicated thread owns the model, batches keep it busy
+        stage("classify", batch_size=CLASSIFIER_BATCH_SIZE),
+        stage("extract", workers=LLM_MAX_CONCURRENCY),
+        stage("locate", workers=2),
+        stage("enrich", batch_size=64),
+        stage("insert", batch_size=SUPABASE_INSERT_CHUNK_SIZE, linger=STREAM_INSERT_LINGER),
+    ])
+
+    def source():
+        # items left half-way by an earlier run re-enter at the stage they stopped before
+        for name in reversed(list(STAGE_INPUTS)):
+            if name != "fetch":
+                for entry in state.pending(STAGE_INPUTS[name]):
+                    yield name, entry
+        with metrics.timer("stage_batch_seconds", stage="scrape"):
+            scraped = scrape_items(state, known_events)
+        for entry in scraped:
+            yield "fetch", entry
+
+    inserted = pipeline.run(source())
+    print(f"inserted {len(inserted)} events")
+    print("openrouter model stats:  ", scheduler.report())
+    print("stream stats:  ", json.dumps(pipeline.report(), indent=2))
+    print("pipeline state:  ", state.counts())
+    return {"stream": pipeline.report(), "llm_models": scheduler.report()}
 
 
 def main():
-    latestNews = getLatestHeadlines()
-    print("latestNews:  ",latestNews)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stages", nargs="+", choices=STAGE_NAMES,
+                        help="run only these stages one after the other, on whatever the checkpoint db has waiting for them")
+    parser.add_argument("--sequential", action="store_true", help="run every stage to completion before the next instead of streaming")
+    parser.add_argument("--retry-failed", action="store_true", help="give items that ran out of attempts another go")
+    parser.add_argument("--status", action="store_true", help="print item counts per stage and exit")
+    args = parser.parse_args()
+
+    state = PipelineState()
+    if args.status:
+        print(json.dumps(state.counts(), indent=2))
+        return
+    if args.retry_failed:
+        print(f"retrying {state.retry_failed()} failed items")
+
     model = "mistralai/mistral-small-3.2-24b-instruct:free"
     fallback_models = ["sarvamai/sarvam-m:free","moonshotai/kimi-dev-72b:free", "deepseek/deepseek-r1-0528:free"]
-    final_data = prepare_final_data(latestNews, model, fallback_models)
-    
-    if len(final_data) >= 1:
-        print("data to be inserted:   ",final_data)
-        insert_data(final_data)
-        print("data inserted successfully--------------")
-    else:
-        print("no data to insert----------")
+    run_info = {}
+    try:
+        if args.stages or args.sequential:
+            run_pipeline(state, model, fallback_models, args.stages)
+        else:
+            run_info = run_streaming(state, model, fallback_models)
+    finally:
+        # written even when the run dies, that's when it's needed most
+        cache_stats = cache_hit_rates(get_cache().stats())
+        print("cache stats:  ", cache_stats)
+        metrics.write(mode="stages" if args.stages or args.sequential else "stream",
+                      pipeline_state=state.counts(), cache=cache_stats, **run_info)
+
+    state.prune()
+    get_cache().prune()
 
 if __name__ == "__main__":
     main()
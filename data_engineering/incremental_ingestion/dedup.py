@@ -0,0 +1,54 @@
+import re
+
+KNOWN_EVENTS_PAGE_SIZE = 1000
+
+
+def normalize_place(value):
+    return re.sub(r'[^a-z0-9]+', ' ', (value or '').lower()).strip()
+
+
+def fuzzy_event_key(event: dict):
+    # same day + same place + same type is treated as the same incident reported by another article
+    place = normalize_place(event.get("location")) or normalize_place(event.get("admin2"))
+    if not event.get("event_date") or not place:
+        return None
+    return (str(event["event_date"])[:10], place, event.get("event_type"))
+
+
+class KnownEvents:
+    def __init__(self):
+        self.urls = set()
+        self.keys = set()
+
+    def load(self, supabase):
+        # paged because PostgREST caps every select at 1000 rows, ordered so page boundaries are stable
+        start = 0
+        while True:
+            rows = (
+                supabase.table("defence_data")
+                .select("source_url,event_date,event_type,location,admin2")
+                .order("id")
+                .range(start, start + KNOWN_EVENTS_PAGE_SIZE - 1)
+                .execute()
+                .data
+            )
+            for row in rows:
+                self.add(row)
+            if len(rows) < KNOWN_EVENTS_PAGE_SIZE:
+                break
+            start += KNOWN_EVENTS_PAGE_SIZE
+        return self
+
+    def add(self, event: dict):
+        if event.get("source_url"):
+            self.urls.add(event["source_url"])
+        key = fuzzy_event_key(event)
+        if key:
+            self.keys.add(key)
+
+    def seen_url(self, url):
+        return url in self.urls
+
+    def seen_event(self, event: dict):
+        key = fuzzy_event_key(event)
+        return key is not None and key in self.keys
@@ -0,0 +1,159 @@
+import os
+import secrets
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client as ServerClient
+
+# pipeline: fp32 transformers pipeline, int8: dynamically quantized Linear layers,
+# onnx: ONNX Runtime export via optimum, distilled: smaller distilled MNLI checkpoint
+CLASSIFIER_BACKEND = os.getenv("CLASSIFIER_BACKEND", "pipeline")
+CLASSIFIER_MODEL = os.getenv("CLASSIFIER_MODEL")
+DEFAULT_MODELS = {
+    "pipeline": "facebook/bart-large-mnli",
+    "int8": "facebook/bart-large-mnli",
+    "onnx": "facebook/bart-large-mnli",
+    "distilled": "valhalla/distilbart-mnli-12-1",
+}
+# the onnx backend exports the checkpoint once into a directory per model here and loads that afterwards
+CLASSIFIER_ONNX_DIR = os.getenv(
+    "CLASSIFIER_ONNX_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "onnx")
+)
+CLASSIFIER_BATCH_SIZE = int(os.getenv("CLASSIFIER_BATCH_SIZE", "8"))
+CLASSIFIER_TORCH_THREADS = int(os.getenv("CLASSIFIER_TORCH_THREADS", str(os.cpu_count() or 1)))
+CLASSIFIER_THRESHOLD = float(os.getenv("CLASSIFIER_THRESHOLD", "0.4"))
+# long-lived worker started with `python classifier_server.py`, keeps the model loaded between runs
+CLASSIFIER_SERVER_HOST = os.getenv("CLASSIFIER_SERVER_HOST", "127.0.0.1")
+CLASSIFIER_SERVER_PORT = int(os.getenv("CLASSIFIER_SERVER_PORT", "6011"))
+# the Listener unpickles what clients send, so the key must stay secret: set it in the environment, or the
+# server generates a random one into this 0600 file, which clients on the same machine read
+CLASSIFIER_SERVER_AUTHKEY = os.getenv("CLASSIFIER_SERVER_AUTHKEY")
+CLASSIFIER_SERVER_KEY_PATH = os.getenv(
+    "CLASSIFIER_SERVER_KEY_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "classifier_server.key")
+)
+USE_CLASSIFIER_SERVER = os.getenv("USE_CLASSIFIER_SERVER", "auto")
+
+# labels for bart model
+labels = {
+    "A bombing or explosion occurred": "Explosions / Remote violence",
+    "A military or armed battle happened": "Battles",
+    "A military strategic decision or deployment occurred": "Strategic developments",
+    "Civilians were attacked or harmed and related to army and terrorist": "Violence against civilians",
+    "This is not related to violence or military events": "Other"
+}
+
+_classifier = None
+_classifier_lock = threading.Lock()
+_server_unavailable = False
+
+
+def load_onnx_model(model: str, onnx_dir: str = CLASSIFIER_ONNX_DIR):
+    try:
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+    except ImportError as e:
+        raise ImportError("CLASSIFIER_BACKEND=onnx needs `pip install optimum[onnxruntime]`") from e
+
+    # exporting bart-large to ONNX takes minutes, only the first load pays for it
+    export_dir = os.path.join(onnx_dir, model.replace("/", "--"))
+    if os.path.exists(os.path.join(export_dir, "model.onnx")):
+        return ORTModelForSequenceClassification.from_pretrained(export_dir)
+    nli_model = ORTModelForSequenceClassification.from_pretrained(model, export=True)
+    nli_model.save_pretrained(export_dir)
+    return nli_model
+
+
+def build_classifier(backend: str = CLASSIFIER_BACKEND, model: str | None = CLASSIFIER_MODEL):
+    import torch
+    from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
+
+    if backend not in DEFAULT_MODELS:
+        raise ValueError(f"unknown classifier backend: {backend}")
+    model = model or DEFAULT_MODELS[backend]
+    torch.set_num_threads(CLASSIFIER_TORCH_THREADS)
+    tokenizer = AutoTokenizer.from_pretrained(model)
+
+    if backend == "onnx":
+        nli_model = load_onnx_model(model)
+    else:
+        nli_model = AutoModelForSequenceClassification.from_pretrained(model)
+        nli_model.eval()
+        if backend == "int8":
+            nli_model = torch.quantization.quantize_dynamic(nli_model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    return pipeline("zero-shot-classification", model=nli_model, tokenizer=tokenizer)
+
+
+def get_classifier():
+    # loaded on first use instead of at import, so runs with nothing to classify skip the model load
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = build_classifier()
+    return _classifier
+
+
+def score_batch_local(contents: list, batch_size: int = CLASSIFIER_BATCH_SIZE, classifier=None):
+    # zero-shot runs one NLI pass per (text, label) pair, the pipeline pads and batches those pairs
+    if not contents:
+        return []
+    classifier = classifier or get_classifier()
+    results = classifier(contents, list(labels.keys()), batch_size=batch_size)
+    if isinstance(results, dict):
+        results = [results]
+    return [(r['labels'][0], r['scores'][0]) for r in results]
+
+
+def server_authkey(create: bool = False):
+    if CLASSIFIER_SERVER_AUTHKEY:
+        return CLASSIFIER_SERVER_AUTHKEY.encode()
+    if create and not os.path.exists(CLASSIFIER_SERVER_KEY_PATH):
+        os.makedirs(os.path.dirname(CLASSIFIER_SERVER_KEY_PATH), exist_ok=True)
+        try:
+            fd = os.open(CLASSIFIER_SERVER_KEY_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+        except FileExistsError:
+            pass
+    try:
+        with open(CLASSIFIER_SERVER_KEY_PATH) as f:
+            return f.read().strip().encode()
+    except FileNotFoundError:
+        raise ConnectionError("no classifier server key, set CLASSIFIER_SERVER_AUTHKEY or start classifier_server.py")
+
+
+def score_batch_remote(contents: list, batch_size: int = CLASSIFIER_BATCH_SIZE):
+    with ServerClient((CLASSIFIER_SERVER_HOST, CLASSIFIER_SERVER_PORT), authkey=server_authkey()) as conn:
+        conn.send({"contents": contents, "batch_size": batch_size})
+        response = conn.recv()
+    if "error" in response:
+        raise RuntimeError(response["error"])
+    return [tuple(r) for r in response["scores"]]
+
+
+def score_batch(contents: list, batch_size: int = CLASSIFIER_BATCH_SIZE):
+    global _server_unavailable
+    if USE_CLASSIFIER_SERVER != "never" and not _server_unavailable and contents:
+        try:
+            return score_batch_remote(contents, batch_size)
+        except (ConnectionError, OSError, EOFError, AuthenticationError) as e:
+            if USE_CLASSIFIER_SERVER == "always":
+                raise
+            # in auto mode the rest of the run stays in process instead of retrying the server every batch
+            _server_unavailable = True
+            print("classifier server not available, loading model in process:  ", e)
+    return score_batch_local(contents, batch_size)
+
+
+def classifier_cache_key():
+    return f"{CLASSIFIER_BACKEND}:{CLASSIFIER_MODEL or DEFAULT_MODELS.get(CLASSIFIER_BACKEND)}"
+
+
+def to_event_label(top_label, score):
+    if score > CLASSIFIER_THRESHOLD and top_label and labels[top_label] != 'Other':
+        return labels[top_label]
+
+
+def classify_batch(contents: list, batch_size: int = CLASSIFIER_BATCH_SIZE):
+    return [to_event_label(label, score) for label, score in score_batch(contents, batch_size)]
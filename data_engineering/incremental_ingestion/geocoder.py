@@ -0,0 +1,221 @@
+import os
+import sys
+import difflib
+import sqlite3
+import time
+import argparse
+import threading
+
+from http_client import http_get
+from dedup import normalize_place
+from ingestion_cache import INGESTION_CACHE_PATH, get_cache
+from run_metrics import metrics
+
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", os.path.join(os.path.dirname(INGESTION_CACHE_PATH), "gazetteer.sqlite"))
+GEOCODE_FUZZY_CUTOFF = float(os.getenv("GEOCODE_FUZZY_CUTOFF", "0.88"))
+# "not found" answers from Nominatim are cached for a shorter time than hits, names get fixed upstream
+GEOCODE_MISS_TTL_DAYS = float(os.getenv("GEOCODE_MISS_TTL_DAYS", "7"))
+# tables (and their unique column, for stable paging) the gazetteer is seeded from with --from-supabase
+GAZETTEER_SUPABASE_TABLES = {"acled_history_events": "event_id_cnty", "defence_data": "id"}
+GAZETTEER_PAGE_SIZE = 1000
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+NOMINATIM_HEADERS = { 'User-Agent': 'MyGeocoder/1.0 (me@example.com)' }
+
+
+class Gazetteer:
+    # offline index of places we already have coordinates for, seeded from acled_history_events
+    def __init__(self, path=GAZETTEER_PATH):
+        self.exact = {}
+        self.by_state = {}
+        self.by_name = {}
+        if not os.path.exists(path):
+            print(f"no gazetteer at {path}, build it with `python geocoder.py --build-gazetteer [--from-supabase]`")
+            return
+        conn = sqlite3.connect(path)
+        for location, admin2, admin1, lat, lon in conn.execute("SELECT location, admin2, admin1, latitude, longitude FROM places"):
+            self._index(location, admin2, admin1, {"lat": lat, "lon": lon})
+        conn.close()
+
+    def _index(self, location, admin2, admin1, coords):
+        name, district, state = normalize_place(location), normalize_place(admin2), normalize_place(admin1)
+        if not name:
+            return
+        # rows come most reported first, the first spelling of a place keeps it
+        self.exact.setdefault((name, district, state), coords)
+        self.by_state.setdefault(state, {}).setdefault(name, coords)
+        self.by_name.setdefault(name, []).append(coords)
+
+    def lookup(self, location, admin2=None, admin1=None):
+        name, district, state = normalize_place(location), normalize_place(admin2), normalize_place(admin1)
+        if not name:
+            return None
+        if (name, district, state) in self.exact:
+            return self.exact[(name, district, state)]
+
+        places = self.by_state.get(state, {})
+        if name in places:
+            return places[name]
+        # a bare name is only trusted when it is unambiguous across states
+        if not state and len(self.by_name.get(name, [])) == 1:
+            return self.by_name[name][0]
+
+        # spelling variants within the same state (e.g. "Kupwara" vs "Kupwarah")
+        close = difflib.get_close_matches(name, places.keys(), n=1, cutoff=GEOCODE_FUZZY_CUTOFF)
+        if close:
+            return places[close[0]]
+        return None
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer():
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer()
+    return _gazetteer
+
+
+def nominatim_search(query: str):
+    # raises on network/HTTP errors so those aren't cached as "not found"
+    response = http_get(NOMINATIM_URL, params={"format": "json", "q": query, "limit": 1}, headers=NOMINATIM_HEADERS)
+    response.raise_for_status()
+    data = response.json()
+    if not data:
+        return None
+    return {"lat": float(data[0]["lat"]), "lon": float(data[0]["lon"])}
+
+
+def geocode(location, admin2=None, admin1=None):
+    query = ', '.join(filter(None, [location, admin2, admin1]))
+    if not query:
+        return {"lat": None, "lon": None}
+    cache = get_cache()
+    key = normalize_place(query)
+
+    # a remembered hit or a remembered "not found" both answer the lookup, counted once as "geocode"
+    entry = cache.get("geocode", key, count=False)
+    if entry is None:
+        entry = cache.get("geocode_miss", key, max_age=GEOCODE_MISS_TTL_DAYS * 86400, count=False)
+    cache.record("geocode", entry is not None)
+    if entry is not None:
+        metrics.count("geocode_total", source="cache")
+        return entry
+
+    coords = get_gazetteer().lookup(location, admin2, admin1) if location else None
+    if coords:
+        metrics.count("geocode_total", source="gazetteer")
+        cache.set("geocode", key, coords)
+        return coords
+
+    try:
+        coords = nominatim_search(query)
+    except Exception as e:
+        print("getLatLongFromLocation error:  ", e)
+        metrics.error("geocode", e)
+        return {"lat": None, "lon": None}
+
+    if coords:
+        metrics.count("geocode_total", source="nominatim")
+        cache.set("geocode", key, coords)
+        return coords
+    metrics.count("geocode_total", source="not_found")
+    coords = {"lat": None, "lon": None}
+    cache.set("geocode_miss", key, coords)
+    return coords
+
+
+def gazetteer_rows_postgres():
+    import psycopg2
+
+    conn = psycopg2.connect(
+        dbname=os.getenv("PG_DB", "borderdata"),
+        user=os.getenv("PG_USER", "postgres"),
+        password=os.getenv("PG_PASS", ""),
+        host=os.getenv("PG_HOST", "btdb.us-east-1.rds.amazonaws.com"),
+        port=os.getenv("PG_PORT", "5432")
+    )
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT location, admin2, admin1, avg(latitude), avg(longitude), count(*)
+        FROM acled_history_events
+        WHERE location IS NOT NULL AND latitude IS NOT NULL AND longitude IS NOT NULL
+        GROUP BY location, admin2, admin1
+    """)
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def gazetteer_rows_supabase(tables=GAZETTEER_SUPABASE_TABLES):
+    # the daily runner only has Supabase credentials; same aggregation as above, paged through PostgREST
+    from supabase import create_client
+
+    supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+    places = {}
+    for table, order_column in tables.items():
+        # keyset paging: OFFSET rescans every skipped row, filtering on the last key seen doesn't
+        last = None
+        try:
+            while True:
+                query = (
+                    supabase.table(table)
+                    .select(f"{order_column},location,admin2,admin1,latitude,longitude")
+                    .not_.is_("location", "null")
+                    .not_.is_("latitude", "null")
+                    .not_.is_("longitude", "null")
+                )
+                if last is not None:
+                    query = query.gt(order_column, last)
+                rows = query.order(order_column).limit(GAZETTEER_PAGE_SIZE).execute().data
+                for row in rows:
+                    place = places.setdefault((row["location"], row.get("admin2"), row.get("admin1")), [0.0, 0.0, 0])
+                    place[0] += float(row["latitude"])
+                    place[1] += float(row["longitude"])
+                    place[2] += 1
+                if len(rows) < GAZETTEER_PAGE_SIZE:
+                    break
+                last = rows[-1][order_column]
+        except Exception as e:
+            print(f"skipping {table} for the gazetteer:  ", e)
+    return [(*key, lat / n, lon / n, n) for key, (lat, lon, n) in places.items()]
+
+
+def build_gazetteer(path=GAZETTEER_PATH, source="postgres", max_age_days=None):
+    if max_age_days is not None and os.path.exists(path) and time.time() - os.path.getmtime(path) < max_age_days * 86400:
+        print(f"gazetteer at {path} is less than {max_age_days} days old, keeping it")
+        return
+    rows = gazetteer_rows_supabase() if source == "supabase" else gazetteer_rows_postgres()
+    if not rows:
+        # keep the previous gazetteer rather than replacing it with an empty one
+        print("no places found, gazetteer not rebuilt")
+        return
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    out = sqlite3.connect(path)
+    out.execute("DROP TABLE IF EXISTS places")
+    out.execute("CREATE TABLE places (location TEXT, admin2 TEXT, admin1 TEXT, latitude REAL, longitude REAL, events INTEGER)")
+    # most reported spelling first so it wins when normalised names collide
+    out.executemany("INSERT INTO places VALUES (?, ?, ?, ?, ?, ?)", sorted(rows, key=lambda r: -r[5]))
+    out.commit()
+    out.close()
+    print(f"gazetteer built with {len(rows)} places at {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--build-gazetteer", action="store_true")
+    parser.add_argument("--from-supabase", action="store_true", help="seed the gazetteer through SUPABASE_URL/KEY instead of PG_*")
+    parser.add_argument("--max-age-days", type=float, default=None, help="only rebuild a gazetteer older than this")
+    parser.add_argument("query", nargs="*")
+    args = parser.parse_args()
+    if args.build_gazetteer:
+        build_gazetteer(source="supabase" if args.from_supabase else "postgres", max_age_days=args.max_age_days)
+    elif args.query:
+        print(geocode(*args.query[:3]))
+    else:
+        parser.print_help()
+        sys.exit(1)
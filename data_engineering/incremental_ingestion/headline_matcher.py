@@ -0,0 +1,117 @@
+import re
+from bisect import bisect_right
+
+# Filter relevent articles based on headline
+event_kw = {
+    # India-specific geo and actor context
+    "india_context" : [
+        "india", "indian", "jammu", "kashmir", "ladakh", "manipur", "pulwama", "uri","delhi",
+        "shopian", "baramulla", "srinagar", "poonch", "northeast","kulgam","jammu",
+        "bsf", "crpf", "iaf", "drdo","isro", "rashtriya rifles", "loc", "lac", "modi"
+    ],
+
+    # Strategic Developments 
+    "strategic" : [
+        "deployment", "military exercise", "war game", "missile test", "satellite launch",
+        "defense deal", "arms procurement", "strategic partnership", "drdo",
+        "joint drill", "air defence", "naval exercise", "border monitoring", "spy satellite","evacuation", 
+        "emabssy","launched","ceasefire", "coastal","coastal security","coastal deployment", "security", "deploys"
+    ],
+
+    #  Battles
+    "battle" : [
+        "firing", "gunfire", "skirmish", "encounter", "cross-border", "ambush", "mortar shelling",
+        "sniper fire", "air strike", "surgical strike", "border clash", "gunfight","army","air force","navy", 
+        "coast guard"
+    ],
+
+    # Explosions / Remote Violence 
+    "explosion" : [
+        "blast", "ied", "explosion", "bomb", "grenade attack", "remote detonation",
+        "landmine", "sabotage"
+    ],
+
+    # Violence Against Civilians
+    "civilian" : [
+        "civilian killed", "villager killed", "innocent killed", "bystander", "mob lynching",
+        "school attacked", "massacre", "hostage", "student killed", "bus attacked"
+    ],
+    "military_or_terror_link" : [
+        "terrorist", "militant", "naxal", "maoist", "encounter", "crpf", "bsf", "army", "jawan"
+    ]
+}
+
+event_kwd_map = {
+    "Strategic developments": "strategic",
+    "Battles": "battle",
+    "Explosions / Remote violence":"explosion",
+    "Violence against civilians": "civilian"                       
+}
+
+
+# every keyword of every category in one alternation, longest first so "coastal security" wins over "coastal";
+# word boundaries stop "uri" matching inside "security", an optional plural catches "blasts"/"encounters"
+_keyword_categories = {}
+for _category, _keywords in event_kw.items():
+    for _keyword in _keywords:
+        _keyword_categories.setdefault(_keyword, set()).add(_category)
+
+# service names and security/coastal/launched turn up in every kind of story, they only decide between categories
+# with the same number of specific terms: "security forces gunfight" is a battle, "navy ... joint drill" strategic
+GENERIC_KEYWORDS = {"security", "coastal", "launched", "army", "air force", "navy", "coast guard"}
+CATEGORY_PRIORITY = ["explosion", "battle", "strategic"]
+_category_labels = {category: label for label, category in event_kwd_map.items()}
+
+# keywords are lowercase and the text is lowered once, several times faster than re.IGNORECASE
+KEYWORD_PATTERN = re.compile(
+    r"\b(" + "|".join(re.escape(k) for k in sorted(_keyword_categories, key=len, reverse=True)) + r")(?:s|es)?\b"
+)
+
+
+def _add_match(scores, keyword):
+    generic = keyword in GENERIC_KEYWORDS
+    for category in _keyword_categories[keyword]:
+        specific_hits, generic_hits = scores.get(category, (0, 0))
+        scores[category] = (specific_hits + (not generic), generic_hits + generic)
+
+
+def score_categories(text: str) -> dict:
+    # single pass over the text, (specific, generic) keyword hits per category
+    scores = {}
+    for match in KEYWORD_PATTERN.finditer(text.lower()):
+        _add_match(scores, match.group(1))
+    return scores
+
+
+def _classify_scores(scores: dict, is_national) -> str | None:
+    in_india = is_national or "india_context" in scores
+
+    if in_india:
+        # the most specific evidence wins; on a tie explosions beat battles beat strategic developments
+        best = max(CATEGORY_PRIORITY, key=lambda category: scores.get(category, (0, 0)))
+        if best in scores:
+            return _category_labels[best]
+
+    if "civilian" in scores and "military_or_terror_link" in scores:
+        return "Violence against civilians"
+
+    return None  # No relevant Indian military event found
+
+
+def classify_india_event(article_text: str, is_national:False) -> str | None:
+    return _classify_scores(score_categories(article_text), is_national)
+
+
+def classify_headlines(titles: list, national_flags: list = None) -> list:
+    # one regex scan over the whole batch; newlines keep keywords from matching across titles
+    national_flags = national_flags or [False] * len(titles)
+    lowered = [title.lower() for title in titles]
+    starts, offset = [], 0
+    for title in lowered:
+        starts.append(offset)
+        offset += len(title) + 1
+
+    scores = [{} for _ in titles]
+    for match in KEYWORD_PATTERN.finditer("\n".join(lowered)):
+        _add_match(scores[bisect_right(starts, match.start()) - 1], match.group(1))
+    return [_classify_scores(s, is_national) for s, is_national in zip(scores, national_flags)]
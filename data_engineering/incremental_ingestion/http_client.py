@@ -0,0 +1,103 @@
+import os
+import time
+import threading
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from run_metrics import metrics
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+HTTP_MAX_WORKERS = int(os.getenv("HTTP_MAX_WORKERS", "8"))
+# politeness: at most this many requests in flight per host, spaced at least HTTP_MIN_INTERVAL apart
+HTTP_PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", "4"))
+HTTP_MIN_INTERVAL = float(os.getenv("HTTP_MIN_INTERVAL", "0.25"))
+
+# hosts with a stricter published usage policy
+HOST_MIN_INTERVALS = {
+    "nominatim.openstreetmap.org": 1.0,
+}
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+
+def create_session(pool_size=HTTP_MAX_WORKERS):
+    retry = Retry(
+        total=HTTP_RETRIES,
+        backoff_factor=HTTP_BACKOFF,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET", "HEAD"],
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"User-Agent": USER_AGENT})
+    return session
+
+
+class HostLimiter:
+    def __init__(self, per_host=HTTP_PER_HOST_LIMIT, min_interval=HTTP_MIN_INTERVAL):
+        self.per_host = per_host
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._next_slot = {}
+
+    def _semaphore(self, host, limit):
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(limit)
+            return self._semaphores[host]
+
+    def _wait_for_slot(self, host):
+        # reserve the next start time for this host, then sleep outside the lock
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = start + HOST_MIN_INTERVALS.get(host, self.min_interval)
+        if start > now:
+            time.sleep(start - now)
+
+    def run(self, url, fn):
+        host = urlparse(url).netloc
+        with self._semaphore(host, 1 if host in HOST_MIN_INTERVALS else self.per_host):
+            self._wait_for_slot(host)
+            return fn()
+
+
+session = create_session()
+limiter = HostLimiter()
+
+
+def http_get(url, timeout=HTTP_TIMEOUT, **kwargs):
+    host = urlparse(url).netloc
+    # timed inside the limiter so politeness waits don't count as request latency
+    def get():
+        with metrics.timer("http_request_seconds", host=host):
+            try:
+                response = session.get(url, timeout=timeout, **kwargs)
+            except Exception as e:
+                metrics.error(host, e)
+                raise
+        metrics.count("http_responses_total", host=host, status=response.status_code)
+        return response
+    return limiter.run(url, get)
+
+
+def map_concurrent(fn, items, max_workers=HTTP_MAX_WORKERS):
+    # keeps input order, exceptions are left to fn to handle
+    items = list(items)
+    if not items:
+        return []
+    # streaming stages call this one item at a time, no point spinning up a pool for that
+    if len(items) == 1:
+        return [fn(items[0])]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(fn, items))
@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+INGESTION_CACHE_PATH = os.getenv(
+    "INGESTION_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "ingestion_cache.sqlite")
+)
+# entries not read for this long are evicted, then the least recently used go until the file fits
+INGESTION_CACHE_MAX_AGE_DAYS = float(os.getenv("INGESTION_CACHE_MAX_AGE_DAYS", "30"))
+INGESTION_CACHE_MAX_BYTES = int(os.getenv("INGESTION_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+# a cached article body is reused without hitting the network for this long
+ARTICLE_TEXT_TTL_HOURS = float(os.getenv("ARTICLE_TEXT_TTL_HOURS", "72"))
+
+_MISSING = object()
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class IngestionCache:
+    def __init__(self, path=INGESTION_CACHE_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        # shared by the fetch thread pool, access is serialised through the lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache(accessed_at)")
+        self._conn.commit()
+        self.hits = {}
+        self.misses = {}
+
+    def get(self, namespace, key, max_age=None, default=None, count=True):
+        # count=False for reads that are part of a larger lookup, the caller records that one with record()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM cache WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            if row is None or (max_age is not None and time.time() - row[1] > max_age):
+                if count:
+                    self._record(namespace, False)
+                return default
+            self._conn.execute(
+                "UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?", (time.time(), namespace, key)
+            )
+            self._conn.commit()
+            if count:
+                self._record(namespace, True)
+            return json.loads(row[0])
+
+    def record(self, namespace, hit):
+        with self._lock:
+            self._record(namespace, hit)
+
+    def _record(self, namespace, hit):
+        counts = self.hits if hit else self.misses
+        counts[namespace] = counts.get(namespace, 0) + 1
+
+    def set(self, namespace, key, value):
+        payload = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, key, payload, len(payload), now, now)
+            )
+            self._conn.commit()
+
+    def prune(self, max_age_days=INGESTION_CACHE_MAX_AGE_DAYS, max_bytes=INGESTION_CACHE_MAX_BYTES):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE accessed_at < ?", (time.time() - max_age_days * 86400,))
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+            if total > max_bytes:
+                rows = self._conn.execute("SELECT namespace, key, size FROM cache ORDER BY accessed_at").fetchall()
+                for namespace, key, size in rows:
+                    if total <= max_bytes:
+                        break
+                    self._conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+                    total -= size
+            self._conn.commit()
+
+    def stats(self):
+        return {"hits": dict(self.hits), "misses": dict(self.misses)}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = IngestionCache()
+    return _cache
+
+
+def cached_article(url, fetch):
+    cache = get_cache()
+    entry = cache.get("article", url, max_age=ARTICLE_TEXT_TTL_HOURS * 3600)
+    if entry is not None:
+        return entry["text"]
+    text = fetch(url)
+    if text:
+        cache.set("article", url, {"text": text, "content_hash": content_hash(text)})
+    return text
+
+
+def cached_classification(contents, model_key, score_batch):
+    # only the texts not seen before (by content hash) go to the model
+    cache = get_cache()
+    keys = [model_key + ":" + content_hash(c) for c in contents]
+    results = [cache.get("bart", k) for k in keys]
+    missing = [i for i, r in enumerate(results) if r is None]
+    if missing:
+        scores = score_batch([contents[i] for i in missing])
+        for i, score in zip(missing, scores):
+            results[i] = list(score)
+            cache.set("bart", keys[i], results[i])
+    return [tuple(r) for r in results]
+
+
+def cached_extraction(article, model_key, extract):
+    # extract returns (raw_response, parsed); a failed call (no response) is not cached so it is retried next run
+    cache = get_cache()
+    key = model_key + ":" + content_hash(article)
+    entry = cache.get("llm", key, default=_MISSING)
+    if entry is not _MISSING:
+        return entry["parsed"]
+    response, parsed = extract(article)
+    if response is not None:
+        cache.set("llm", key, {"parsed": parsed})
+    return parsed
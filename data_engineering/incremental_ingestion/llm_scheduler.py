@@ -0,0 +1,134 @@
+import os
+import time
+import threading
+
+from run_metrics import metrics
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+# OpenRouter free models allow ~20 requests/minute each
+LLM_RATE_PER_MINUTE = float(os.getenv("LLM_RATE_PER_MINUTE", "20"))
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "4"))
+# used as the latency of a model we haven't timed yet, so the primary model is tried first
+LLM_PRIOR_LATENCY = float(os.getenv("LLM_PRIOR_LATENCY", "20"))
+LLM_DEFAULT_COOLDOWN = float(os.getenv("LLM_DEFAULT_COOLDOWN", "30"))
+EWMA_ALPHA = 0.3
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute=LLM_RATE_PER_MINUTE):
+        self.capacity = max(1.0, rate_per_minute)
+        self.tokens = self.capacity
+        self.refill_per_second = rate_per_minute / 60
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+    def wait_time(self, now):
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.refill_per_second
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+
+class ModelStats:
+    def __init__(self, model):
+        self.model = model
+        self.bucket = TokenBucket()
+        self.cooldown_until = 0.0
+        self.latency_ewma = None
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def score(self, rank):
+        # expected latency inflated by the observed error rate; rank breaks ties in the configured order
+        latency = self.latency_ewma if self.latency_ewma is not None else LLM_PRIOR_LATENCY
+        error_rate = (self.errors + 1) / (self.calls + 2)
+        return (latency * (1 + 4 * error_rate), rank)
+
+    def record(self, seconds, ok):
+        self.calls += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        if not ok:
+            self.errors += 1
+        elif self.latency_ewma is None:
+            self.latency_ewma = seconds
+        else:
+            self.latency_ewma = EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * self.latency_ewma
+
+    def report(self):
+        return {
+            "model": self.model,
+            "calls": self.calls,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "avg_seconds": round(self.total_seconds / self.calls, 2) if self.calls else None,
+            "max_seconds": round(self.max_seconds, 2),
+            "latency_ewma": round(self.latency_ewma, 2) if self.latency_ewma is not None else None,
+        }
+
+
+def retry_after_seconds(error):
+    # openai.APIStatusError carries the http response, 429s from OpenRouter set Retry-After
+    if getattr(error, "status_code", None) != 429:
+        return None
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return LLM_DEFAULT_COOLDOWN
+
+
+class LLMScheduler:
+    def __init__(self, models, max_concurrency=LLM_MAX_CONCURRENCY, max_attempts=LLM_MAX_ATTEMPTS):
+        self.models = [ModelStats(m) for m in models]
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def _reserve_model(self):
+        # blocks until some model is out of cooldown and has a rate-limit token, then picks the best scored one
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                ready = [(m.score(i), m) for i, m in enumerate(self.models)
+                         if m.cooldown_until <= now and m.bucket.wait_time(now) == 0]
+                if ready:
+                    _, model = min(ready, key=lambda r: r[0])
+                    model.bucket.take(now)
+                    return model
+                wait = min(max(m.cooldown_until - now, m.bucket.wait_time(now)) for m in self.models)
+            time.sleep(max(wait, 0.05))
+
+    def complete(self, call):
+        # call(model) -> response text, raises on failure; a failed attempt moves on to the next ready model
+        with self._slots:
+            for _ in range(self.max_attempts):
+                model = self._reserve_model()
+                start = time.monotonic()
+                try:
+                    response = call(model.model)
+                    with self._lock:
+                        model.record(time.monotonic() - start, True)
+                    return response
+                except Exception as e:
+                    metrics.error("openrouter", e)
+                    cooldown = retry_after_seconds(e)
+                    with self._lock:
+                        model.record(time.monotonic() - start, False)
+                        if cooldown is not None:
+                            model.rate_limited += 1
+                            model.cooldown_until = time.monotonic() + cooldown
+                    print(f"openrouter error ({model.model}):  ", e)
+        return None
+
+    def report(self):
+        with self._lock:
+            return [m.report() for m in self.models]
@@ -0,0 +1,111 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from ingestion_cache import INGESTION_CACHE_PATH
+
+PIPELINE_STATE_PATH = os.getenv(
+    "PIPELINE_STATE_PATH", os.path.join(os.path.dirname(INGESTION_CACHE_PATH), "pipeline_state.sqlite")
+)
+# an item that fails a stage this many times is parked as failed until --retry-failed
+PIPELINE_MAX_ATTEMPTS = int(os.getenv("PIPELINE_MAX_ATTEMPTS", "3"))
+# finished (inserted / skipped / failed) items are kept this long so reruns don't pick the same urls up again
+PIPELINE_RETENTION_DAYS = float(os.getenv("PIPELINE_RETENTION_DAYS", "14"))
+
+# stage = last stage an item completed, each one is the input of the next.
+# scraped/fetched are the raw (bronze) layer, classified/extracted/located the cleaned (silver) one,
+# enriched holds the final defence_data row (gold)
+STAGES = ["scraped", "fetched", "classified", "extracted", "located", "enriched", "inserted"]
+
+PENDING = "pending"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+class PipelineState:
+    def __init__(self, path=PIPELINE_STATE_PATH, max_attempts=PIPELINE_MAX_ATTEMPTS):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS items (
+                url TEXT PRIMARY KEY,
+                stage TEXT NOT NULL,
+                status TEXT NOT NULL,
+                data TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_items_stage ON items(stage, status)")
+        self._conn.commit()
+
+    def add_headlines(self, headlines):
+        # (url, title, published) from the listing pages; urls already tracked keep their progress
+        now = time.time()
+        with self._lock:
+            cur = self._conn.executemany(
+                "INSERT OR IGNORE INTO items (url, stage, status, data, created_at, updated_at) VALUES (?, 'scraped', ?, ?, ?, ?)",
+                [(url, PENDING, json.dumps({"title": title, "published": published}), now, now)
+                 for url, title, published in headlines]
+            )
+            self._conn.commit()
+            return cur.rowcount
+
+    def pending(self, stage):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, data FROM items WHERE stage = ? AND status = ? ORDER BY created_at, url", (stage, PENDING)
+            ).fetchall()
+        return [(url, json.loads(data)) for url, data in rows]
+
+    def _update(self, url, sql, params):
+        with self._lock:
+            self._conn.execute(f"UPDATE items SET {sql}, updated_at = ? WHERE url = ?", (*params, time.time(), url))
+            self._conn.commit()
+
+    def advance(self, url, data, stage):
+        # data is the item's full record, the next stage's output merged into what it was given
+        self._update(url, "stage = ?, status = ?, data = ?, attempts = 0, error = NULL", (stage, PENDING, json.dumps(data)))
+
+    def skip(self, url, reason):
+        self._update(url, "status = ?, error = ?", (SKIPPED, reason))
+
+    def fail(self, url, error):
+        # stays at its stage so the next run retries it, until it runs out of attempts
+        self._update(
+            url,
+            "attempts = attempts + 1, error = ?, status = CASE WHEN attempts + 1 >= ? THEN ? ELSE status END",
+            (str(error), self.max_attempts, FAILED)
+        )
+
+    def retry_failed(self):
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE items SET status = ?, attempts = 0, updated_at = ? WHERE status = ?", (PENDING, time.time(), FAILED)
+            )
+            self._conn.commit()
+            return cur.rowcount
+
+    def counts(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT stage, status, count(*) FROM items GROUP BY stage, status").fetchall()
+        return {f"{stage}/{status}": n for stage, status, n in rows}
+
+    def prune(self, retention_days=PIPELINE_RETENTION_DAYS):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM items WHERE (stage = 'inserted' OR status != ?) AND updated_at < ?",
+                (PENDING, time.time() - retention_days * 86400)
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import threading
+import functools
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from ingestion_cache import INGESTION_CACHE_PATH
+
+RUN_REPORT_PATH = os.getenv("RUN_REPORT_PATH", os.path.join(os.path.dirname(INGESTION_CACHE_PATH), "run_report.json"))
+# Prometheus text exposition file, e.g. for node_exporter's textfile collector; unset to skip
+RUN_METRICS_PROM_PATH = os.getenv("RUN_METRICS_PROM_PATH")
+# optional Pushgateway base url, the run is pushed as job="daily_events"
+RUN_METRICS_PUSHGATEWAY = os.getenv("RUN_METRICS_PUSHGATEWAY")
+METRICS_PREFIX = "ingestion_"
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def count(self, name, value=1, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self.histograms.setdefault(key, []).append(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, name, **labels):
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def error(self, where, error):
+        self.count("errors_total", where=where, type=type(error).__name__ if isinstance(error, BaseException) else str(error))
+
+    def snapshot(self):
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self.counters.items())]
+            histograms = []
+            for (name, labels), values in sorted(self.histograms.items()):
+                histograms.append({
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": len(values),
+                    "sum": round(sum(values), 4),
+                    "p50": _percentile(values, 0.5),
+                    "p95": _percentile(values, 0.95),
+                    "max": max(values),
+                    "buckets": {str(b): sum(v <= b for v in values) for b in LATENCY_BUCKETS},
+                })
+        return {"counters": counters, "histograms": histograms}
+
+    def report(self, **extra):
+        return {
+            "started_at": datetime.fromtimestamp(self.started, timezone.utc).isoformat(),
+            "duration_seconds": round(time.time() - self.started, 2),
+            **self.snapshot(),
+            **extra,
+        }
+
+    def to_prometheus(self):
+        lines = []
+        snapshot = self.snapshot()
+
+        def fmt_labels(labels, **more):
+            labels = {**labels, **more}
+            if not labels:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+        typed = set()
+        for c in snapshot["counters"]:
+            name = METRICS_PREFIX + c["name"]
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{fmt_labels(c['labels'])} {c['value']}")
+        for h in snapshot["histograms"]:
+            name = METRICS_PREFIX + h["name"]
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            for bucket, n in h["buckets"].items():
+                lines.append(f"{name}_bucket{fmt_labels(h['labels'], le=bucket)} {n}")
+            lines.append(f"{name}_bucket{fmt_labels(h['labels'], le='+Inf')} {h['count']}")
+            lines.append(f"{name}_sum{fmt_labels(h['labels'])} {h['sum']}")
+            lines.append(f"{name}_count{fmt_labels(h['labels'])} {h['count']}")
+        lines.append(f"# TYPE {METRICS_PREFIX}run_duration_seconds gauge")
+        lines.append(f"{METRICS_PREFIX}run_duration_seconds {round(time.time() - self.started, 2)}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path=RUN_REPORT_PATH, prom_path=RUN_METRICS_PROM_PATH, pushgateway=RUN_METRICS_PUSHGATEWAY, **extra):
+        report = self.report(**extra)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"run report written to {path}")
+
+        if prom_path:
+            # written to a temp file first so a scraper never reads half a file
+            with open(prom_path + ".tmp", "w") as f:
+                f.write(self.to_prometheus())
+            os.replace(prom_path + ".tmp", prom_path)
+        if pushgateway:
+            try:
+                import requests
+                requests.put(pushgateway.rstrip("/") + "/metrics/job/daily_events", data=self.to_prometheus(), timeout=10).raise_for_status()
+            except Exception as e:
+                print("failed to push run metrics:  ", e)
+        return report
+
+
+metrics = Metrics()
+
+
+def cache_hit_rates(stats):
+    # IngestionCache.stats() is {hits: {namespace: n}, misses: {...}}, regrouped per namespace
+    namespaces = set(stats["hits"]) | set(stats["misses"])
+    rates = {}
+    for namespace in sorted(namespaces):
+        hits, misses = stats["hits"].get(namespace, 0), stats["misses"].get(namespace, 0)
+        rates[namespace] = {"hits": hits, "misses": misses, "hit_rate": round(hits / (hits + misses), 3)}
+    return rates
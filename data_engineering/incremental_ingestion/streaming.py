@@ -0,0 +1,171 @@
+import os
+import time
+import queue
+import threading
+
+# items waiting between two stages; a full queue blocks the upstream workers (backpressure)
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "32"))
+# how long a batching stage waits to fill a batch before running a partial one
+STREAM_BATCH_LINGER = float(os.getenv("STREAM_BATCH_LINGER", "0.5"))
+
+_DONE = object()
+
+
+class Channel:
+    # bounded queue between stages, closed (one _DONE per consumer) once every producer has finished
+    def __init__(self, maxsize=STREAM_QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize)
+        self.producers = 0
+        self.consumers = 0
+        self._lock = threading.Lock()
+
+    def put(self, item):
+        self.queue.put(item)
+
+    def get(self, timeout=None):
+        return self.queue.get(timeout=timeout)
+
+    def close(self):
+        with self._lock:
+            self.producers -= 1
+            last = self.producers == 0
+        if last:
+            for _ in range(self.consumers):
+                self.queue.put(_DONE)
+
+
+class Stage:
+    # fn takes a list of items and returns one output per item, None drops the item
+    def __init__(self, name, fn, workers=1, batch_size=1, linger=STREAM_BATCH_LINGER):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.batch_size = batch_size
+        self.linger = linger
+        self.items_in = 0
+        self.items_out = 0
+        self.batches = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.waiting_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def report(self, wall_seconds):
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "batches": self.batches,
+            "errors": self.errors,
+            "items_per_second": round(self.items_in / wall_seconds, 2) if wall_seconds else None,
+            # busy: running fn, waiting: starved for input, blocked: downstream queue full
+            "busy_seconds": round(self.busy_seconds, 2),
+            "waiting_seconds": round(self.waiting_seconds, 2),
+            "blocked_seconds": round(self.blocked_seconds, 2),
+        }
+
+
+class StreamPipeline:
+    def __init__(self, stages, queue_size=STREAM_QUEUE_SIZE):
+        self.stages = stages
+        self.inboxes = {stage.name: Channel(queue_size) for stage in stages}
+        self.results = []
+        self.wall_seconds = 0.0
+        self._results_lock = threading.Lock()
+
+    def _next_inbox(self, stage):
+        i = self.stages.index(stage)
+        return self.inboxes[self.stages[i + 1].name] if i + 1 < len(self.stages) else None
+
+    def _take_batch(self, stage, inbox):
+        # blocks for the first item, then fills the batch for at most stage.linger seconds
+        start = time.monotonic()
+        item = inbox.get()
+        if item is _DONE:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + stage.linger
+        while len(batch) < stage.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = inbox.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _DONE:
+                stage.record(waiting_seconds=time.monotonic() - start)
+                return batch, True
+            batch.append(item)
+        stage.record(waiting_seconds=time.monotonic() - start)
+        return batch, False
+
+    def _worker(self, stage):
+        inbox, outbox = self.inboxes[stage.name], self._next_inbox(stage)
+        done = False
+        while not done:
+            batch, done = self._take_batch(stage, inbox)
+            if not batch:
+                continue
+            start = time.monotonic()
+            try:
+                outputs = stage.fn(batch)
+            except Exception as e:
+                print(f"stream stage {stage.name} failed on a batch of {len(batch)}:  ", e)
+                stage.record(errors=len(batch))
+                outputs = [None] * len(batch)
+            stage.record(items_in=len(batch), batches=1, busy_seconds=time.monotonic() - start)
+
+            outputs = [o for o in outputs if o is not None]
+            stage.record(items_out=len(outputs))
+            if outbox is None:
+                with self._results_lock:
+                    self.results.extend(outputs)
+                continue
+            start = time.monotonic()
+            for output in outputs:
+                outbox.put(output)
+            stage.record(blocked_seconds=time.monotonic() - start)
+        if outbox is not None:
+            outbox.close()
+
+    def _feed(self, source):
+        # source yields (stage name, item) so resumed items can enter mid-pipeline
+        try:
+            for stage_name, item in source:
+                self.inboxes[stage_name].put(item)
+        finally:
+            for inbox in self.inboxes.values():
+                inbox.close()
+
+    def run(self, source):
+        # every stage's inbox is fed by the previous stage's workers plus the source
+        for i, stage in enumerate(self.stages):
+            inbox = self.inboxes[stage.name]
+            inbox.consumers = stage.workers
+            inbox.producers = 1 + (self.stages[i - 1].workers if i else 0)
+
+        start = time.monotonic()
+        threads = [threading.Thread(target=self._feed, args=(source,), name="stream-source", daemon=True)]
+        for stage in self.stages:
+            threads += [threading.Thread(target=self._worker, args=(stage,), name=f"stream-{stage.name}-{n}", daemon=True)
+                        for n in range(stage.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.wall_seconds = time.monotonic() - start
+        return self.results
+
+    def report(self):
+        return {
+            "wall_seconds": round(self.wall_seconds, 2),
+            "stages": [stage.report(self.wall_seconds) for stage in self.stages],
+        }
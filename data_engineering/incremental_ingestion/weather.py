@@ -0,0 +1,191 @@
+import os
+import argparse
+from datetime import date
+
+from http_client import http_get, map_concurrent
+from ingestion_cache import get_cache
+from run_metrics import metrics
+
+OPEN_METEO_ARCHIVE_URL = "https://archive-api.open-meteo.com/v1/archive"
+# ERA5 behind the archive API is ~0.25 degrees, finer snapping would only split identical answers
+WEATHER_GRID_DEG = float(os.getenv("WEATHER_GRID_DEG", "0.25"))
+# dates further apart than this in one cell are fetched as separate ranges instead of one long one
+WEATHER_MAX_GAP_DAYS = int(os.getenv("WEATHER_MAX_GAP_DAYS", "31"))
+WEATHER_MAX_RANGE_DAYS = int(os.getenv("WEATHER_MAX_RANGE_DAYS", "366"))
+WEATHER_BACKFILL_BATCH = int(os.getenv("WEATHER_BACKFILL_BATCH", "5000"))
+
+EMPTY_WEATHER = {"max_temp": None, "min_temp": None, "weather_condition": None}
+
+
+def get_simplified_weather_condition(weather_code):
+    if weather_code is None:
+        return "Unknown"
+    elif weather_code == 0:
+        return "Clear"
+    elif 1 <= weather_code <= 3:
+        return "Cloudy"
+    elif 45 <= weather_code <= 48:
+        return "Fog/Haze"
+    elif 51 <= weather_code <= 67:
+        return "Rain"
+    elif 71 <= weather_code <= 77:
+        return "Snow"
+    elif 80 <= weather_code <= 86:
+        return "Rain"
+    elif 95 <= weather_code <= 99:
+        return "Thunderstorm"
+    else:
+        return "Extreme"
+
+
+def snap(value):
+    return round(round(float(value) / WEATHER_GRID_DEG) * WEATHER_GRID_DEG, 4)
+
+
+def _to_day(value):
+    try:
+        return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def _date_ranges(days):
+    # contiguous-enough runs of dates, each becomes one archive request
+    days = sorted(set(days))
+    ranges = []
+    start = prev = days[0]
+    for day in days[1:]:
+        if (day - prev).days > WEATHER_MAX_GAP_DAYS or (day - start).days >= WEATHER_MAX_RANGE_DAYS:
+            ranges.append((start, prev))
+            start = day
+        prev = day
+    ranges.append((start, prev))
+    return ranges
+
+
+def _fetch_cell_range(job):
+    (lat, lon), (start, end) = job
+    params = {
+        "latitude": lat,
+        "longitude": lon,
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+        "daily": "weathercode,temperature_2m_max,temperature_2m_min",
+        "timezone": "auto"
+    }
+    try:
+        res = http_get(OPEN_METEO_ARCHIVE_URL, params=params)
+        res.raise_for_status()
+        return (lat, lon), res.json().get("daily", {})
+    except Exception as e:
+        print("fetch_weather error:  ", e)
+        metrics.error("weather", e)
+        return (lat, lon), None
+
+
+def _to_weather(max_temp, min_temp, weather_code):
+    return {
+        "max_temp": float(max_temp) if max_temp is not None else None,
+        "min_temp": float(min_temp) if min_temp is not None else None,
+        "weather_code": int(weather_code) if weather_code is not None else None,
+        "weather_condition": get_simplified_weather_condition(int(weather_code)) if weather_code is not None else None
+    }
+
+
+def enrich_weather(points):
+    # points: [(lat, lon, date)], returns one weather dict per point in the same order.
+    # requests scale with distinct (grid cell, date range) pairs, not with the number of events
+    cache = get_cache()
+    keys = []
+    # one cache read per distinct cell and day, the answers are reused below so hit rates stay honest
+    found = {}
+    missing = {}
+    for lat, lon, day in points:
+        day = _to_day(day)
+        if lat is None or lon is None or day is None:
+            keys.append(None)
+            continue
+        cell = (snap(lat), snap(lon))
+        key = f"{cell[0]},{cell[1]},{day.isoformat()}"
+        keys.append(key)
+        if key not in found:
+            found[key] = cache.get("weather", key)
+        if found[key] is None:
+            missing.setdefault(cell, set()).add(day)
+
+    jobs = [(cell, date_range) for cell, days in missing.items() for date_range in _date_ranges(days)]
+    metrics.count("weather_points_total", len(points))
+    metrics.count("weather_requests_total", len(jobs))
+    for cell, daily in map_concurrent(_fetch_cell_range, jobs):
+        if not daily:
+            continue
+        for day, code, max_temp, min_temp in zip(daily.get("time", []), daily.get("weathercode", []),
+                                                 daily.get("temperature_2m_max", []), daily.get("temperature_2m_min", [])):
+            # archive has a few days of lag, don't pin an empty answer for recent dates
+            if code is None and max_temp is None:
+                continue
+            key = f"{cell[0]},{cell[1]},{day}"
+            found[key] = _to_weather(max_temp, min_temp, code)
+            cache.set("weather", key, found[key])
+
+    return [dict(found.get(key) or EMPTY_WEATHER) if key else dict(EMPTY_WEATHER) for key in keys]
+
+
+def backfill_acled_weather(batch_size=WEATHER_BACKFILL_BATCH):
+    import psycopg2
+    from psycopg2.extras import execute_values
+
+    conn = psycopg2.connect(
+        dbname=os.getenv("PG_DB", "borderdata"),
+        user=os.getenv("PG_USER", "postgres"),
+        password=os.getenv("PG_PASS", ""),
+        host=os.getenv("PG_HOST", "btdb.us-east-1.rds.amazonaws.com"),
+        port=os.getenv("PG_PORT", "5432")
+    )
+    cur = conn.cursor()
+    last_id = ""
+    total = 0
+    while True:
+        cur.execute("""
+            SELECT event_id_cnty, latitude, longitude, event_date
+            FROM acled_history_events
+            WHERE weather_code IS NULL AND latitude IS NOT NULL AND longitude IS NOT NULL
+              AND event_date < CURRENT_DATE - 7 AND event_id_cnty > %s
+            ORDER BY event_id_cnty
+            LIMIT %s
+        """, (last_id, batch_size))
+        rows = cur.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        weather = enrich_weather([(r[1], r[2], r[3]) for r in rows])
+        updates = [
+            (r[0], w["weather_code"], w["weather_condition"],
+             (w["max_temp"] + w["min_temp"]) / 2 if w["max_temp"] is not None and w["min_temp"] is not None else None)
+            for r, w in zip(rows, weather) if w.get("weather_code") is not None
+        ]
+        execute_values(cur, """
+            UPDATE acled_history_events AS a
+            SET weather_code = v.weather_code::INTEGER, weather_condition = v.weather_condition, temperature = v.temperature::DECIMAL
+            FROM (VALUES %s) AS v(event_id_cnty, weather_code, weather_condition, temperature)
+            WHERE a.event_id_cnty = v.event_id_cnty
+        """, updates)
+        conn.commit()
+        total += len(updates)
+        print(f"weather backfilled for {total} events")
+    if total:
+        # defence_events and the rollup are only synced on INSERT, see materialize_defence_events.sql
+        cur.execute("SELECT refresh_defence_events(); SELECT rebuild_defence_event_rollup(); SELECT bump_data_version();")
+        conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backfill-acled", action="store_true")
+    args = parser.parse_args()
+    if args.backfill_acled:
+        backfill_acled_weather()
+    else:
+        parser.print_help()
@@ -1,22 +1,161 @@
+import io
+import os
+import argparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
 import pandas as pd
-from sqlalchemy import create_engine
+import psycopg2
 
 # Set PostgreSQL connection info
 db_config = {
-    "dbname":"borderdata",
-    "user":"postgres",
-    "password":"",
-    "host":"btdb.us-east-1.rds.amazonaws.com",
-    "port":5432
+    "dbname": os.getenv("PG_DB", "borderdata"),
+    "user": os.getenv("PG_USER", "postgres"),
+    "password": os.getenv("PG_PASS", ""),
+    "host": os.getenv("PG_HOST", "btdb.us-east-1.rds.amazonaws.com"),
+    "port": int(os.getenv("PG_PORT", "5432"))
 }
 
-# Create engine
-engine = create_engine(f"postgresql+psycopg2://{db_config['user']}:{db_config['password']}@{db_config['host']}:{db_config['port']}/{db_config['dbname']}")
+TARGET_TABLE = "acled_history_events"
+STAGING_TABLE = "acled_history_events_staging"
+CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "100000"))
+WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+
+
+def connect():
+    return psycopg2.connect(**db_config)
+
+
+def table_columns(cur, table):
+    cur.execute("""
+        SELECT column_name, data_type FROM information_schema.columns
+        WHERE table_name = %s ORDER BY ordinal_position
+    """, (table,))
+    return dict(cur.fetchall())
+
+
+def prepare_staging():
+    conn = connect()
+    cur = conn.cursor()
+    # unlogged and index-free, it only lives for the duration of a load
+    cur.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+    cur.execute(f"CREATE UNLOGGED TABLE {STAGING_TABLE} (LIKE {TARGET_TABLE} INCLUDING DEFAULTS)")
+    conn.commit()
+    conn.close()
+
+
+def to_copy_buffer(chunk: pd.DataFrame, columns, integer_columns):
+    # pandas reads integer columns with gaps as floats, COPY would reject "12.0"
+    for column in integer_columns:
+        if column in chunk and chunk[column].dtype.kind == "f":
+            chunk[column] = chunk[column].astype("Int64")
+
+    # geom is computed here as EWKT so the separate full-table UPDATE is no longer needed
+    chunk["geom"] = None
+    if "latitude" in chunk and "longitude" in chunk:
+        has_coords = chunk["latitude"].notna() & chunk["longitude"].notna()
+        chunk.loc[has_coords, "geom"] = (
+            "SRID=4326;POINT(" + chunk.loc[has_coords, "longitude"].astype(str) + " "
+            + chunk.loc[has_coords, "latitude"].astype(str) + ")"
+        )
+    buffer = io.StringIO()
+    chunk[columns].to_csv(buffer, index=False, header=False, na_rep="\\N", date_format="%Y-%m-%d")
+    buffer.seek(0)
+    return buffer
+
+
+def quoted(columns):
+    return ", ".join(f'"{c}"' for c in columns)
+
+
+def copy_chunk(chunk: pd.DataFrame, columns, integer_columns):
+    buffer = to_copy_buffer(chunk, columns, integer_columns)
+    conn = connect()
+    try:
+        cur = conn.cursor()
+        cur.copy_expert(
+            f"COPY {STAGING_TABLE} ({quoted(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            buffer
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return len(chunk)
+
+
+def merge_staging(columns):
+    # idempotent on event_id_cnty: reloading the same file updates rows in place instead of duplicating them
+    updates = ", ".join(f'"{c}" = EXCLUDED."{c}"' for c in columns if c != "event_id_cnty")
+    order_by = 'event_id_cnty, "timestamp" DESC NULLS LAST' if "timestamp" in columns else "event_id_cnty"
+    conn = connect()
+    cur = conn.cursor()
+    cur.execute(f"""
+        INSERT INTO {TARGET_TABLE} ({quoted(columns)})
+        SELECT DISTINCT ON (event_id_cnty) {quoted(columns)}
+        FROM {STAGING_TABLE}
+        ORDER BY {order_by}
+        ON CONFLICT (event_id_cnty) DO UPDATE SET {updates}
+    """)
+    merged = cur.rowcount
+    cur.execute(f"DROP TABLE {STAGING_TABLE}")
+    conn.commit()
+    conn.close()
+    return merged
+
+
+def refresh_derived():
+    # the upsert updates existing rows, and defence_events / the rollup are only synced on INSERT
+    # (see migrations/materialize_defence_events.sql); the version bump invalidates the API's cache
+    conn = connect()
+    cur = conn.cursor()
+    for function in ("refresh_defence_events", "rebuild_defence_event_rollup", "bump_data_version"):
+        cur.execute("SELECT to_regproc(%s) IS NOT NULL", (function,))
+        if cur.fetchone()[0]:
+            cur.execute(f"SELECT {function}()")
+        else:
+            print(f"{function}() not found, skipped")
+    conn.commit()
+    conn.close()
+
+
+def load_csv(path, chunk_rows=CHUNK_ROWS, workers=WORKERS):
+    conn = connect()
+    target_columns = table_columns(conn.cursor(), TARGET_TABLE)
+    conn.close()
+
+    integer_columns = [c for c, data_type in target_columns.items() if data_type in ("integer", "bigint", "smallint")]
+
+    header = pd.read_csv(path, nrows=0).columns
+    columns = [c for c in target_columns if c in header or c == "geom"]
+    csv_columns = [c for c in columns if c != "geom"]
+    prepare_staging()
+
+    loaded = 0
+    pending = set()
+    # at most 2 chunks per worker are in memory at any time
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for chunk in pd.read_csv(path, usecols=csv_columns, parse_dates=["event_date"], chunksize=chunk_rows):
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    loaded += future.result()
+                print(f"copied {loaded} rows")
+            pending.add(pool.submit(copy_chunk, chunk, columns, integer_columns))
+        for future in pending:
+            loaded += future.result()
+    print(f"copied {loaded} rows into {STAGING_TABLE}")
+
+    merged = merge_staging(columns)
+    print(f"merged {merged} rows into {TARGET_TABLE}")
+    refresh_derived()
+    print("refreshed defence_events and the dashboard rollup")
 
-# Read the CSV file
-df = pd.read_csv("data/filtered_dataset_20062025.csv", parse_dates=["event_date"])
 
-# Ingest data into PostgreSQL
-df.to_sql("acled_history_events", engine, if_exists="append", index=False)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("csv", nargs="?", default="data/filtered_dataset_20062025.csv")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    args = parser.parse_args()
 
-print("Data ingestion complete.")
+    load_csv(args.csv, args.chunk_rows, args.workers)
+    print("Data ingestion complete.")
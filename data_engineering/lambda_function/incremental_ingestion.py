@@ -1,6 +1,7 @@
 import json
 import os
 import psycopg2
+from psycopg2.extras import execute_values
 from datetime import datetime
 
 # Environment variables
@@ -18,6 +19,96 @@ CORS_HEADERS = {
     "Access-Control-Allow-Methods": "POST,OPTIONS"
 }
 
+INSERT_CHUNK_SIZE = int(os.environ.get("INSERT_CHUNK_SIZE", "500"))
+
+INSERT_SQL = """
+    INSERT INTO defence_data (
+        event_date, event_type, actor1, actor2, civilian_targeting, country,
+        admin1, admin2, admin3, location, latitude, longitude,
+        source, source_scale, source_url, notes, fatalities,
+        weather_condition, temperature, geom
+    ) VALUES %s
+    ON CONFLICT (source_url) DO NOTHING
+    RETURNING id
+"""
+INSERT_TEMPLATE = """(
+    %s, %s, %s, %s, %s, %s,
+    %s, %s, %s, %s, %s, %s,
+    %s, %s, %s, %s, %s,
+    %s, %s,
+    ST_SetSRID(ST_MakePoint(%s, %s), 4326)
+)"""
+
+
+def prepare_rows(body):
+    # returns (rows, skipped); rows keep their index in the request so errors can point back at them
+    rows = []
+    skipped = []
+    for index, item in enumerate(body):
+        lat = item.get("latitude") if isinstance(item, dict) else None
+        lon = item.get("longitude") if isinstance(item, dict) else None
+
+        if lat is None or lon is None:
+            skipped.append({"index": index, "reason": "missing latitude/longitude"})
+            continue
+        try:
+            rows.append((index, (
+                datetime.strptime(item["event_date"], "%Y-%m-%d").date(),
+                item.get("event_type"),
+                item.get("actor1"),
+                item.get("actor2"),
+                item.get("civilian_targeting"),
+                item.get("country"),
+                item.get("admin1"),
+                item.get("admin2"),
+                item.get("admin3"),
+                item.get("location"),
+                float(lat),
+                float(lon),
+                item.get("source"),
+                item.get("source_scale"),
+                item.get("source_url"),
+                item.get("notes"),
+                int(item.get("fatalities", 0)),
+                item.get("weather_condition"),
+                int(item.get("temperature", 0)),
+                float(lon),
+                float(lat),
+            )))
+        except (KeyError, TypeError, ValueError) as e:
+            skipped.append({"index": index, "reason": f"invalid value: {e}"})
+    return rows, skipped
+
+
+def bulk_insert(cur, rows):
+    # one multi-row INSERT per chunk; a failing chunk is retried row by row behind savepoints
+    # so a single bad row is reported instead of sinking the whole request
+    inserted = 0
+    errors = []
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        chunk = rows[start:start + INSERT_CHUNK_SIZE]
+        cur.execute("SAVEPOINT chunk")
+        try:
+            result = execute_values(cur, INSERT_SQL, [values for _, values in chunk],
+                                    template=INSERT_TEMPLATE, page_size=len(chunk), fetch=True)
+            cur.execute("RELEASE SAVEPOINT chunk")
+            inserted += len(result)
+            continue
+        except psycopg2.Error:
+            cur.execute("ROLLBACK TO SAVEPOINT chunk")
+
+        for index, values in chunk:
+            cur.execute("SAVEPOINT row")
+            try:
+                result = execute_values(cur, INSERT_SQL, [values], template=INSERT_TEMPLATE, fetch=True)
+                cur.execute("RELEASE SAVEPOINT row")
+                inserted += len(result)
+            except psycopg2.Error as e:
+                cur.execute("ROLLBACK TO SAVEPOINT row")
+                errors.append({"index": index, "error": str(e).strip()})
+    return inserted, errors
+
+
 def lambda_handler(event, context):
     if event.get("requestContext", {}).get("http", {}).get("method") == "OPTIONS":
         return {
@@ -43,63 +134,35 @@ def lambda_handler(event, context):
                 "body": "Invalid JSON array"
             }
 
+        rows, skipped = prepare_rows(body)
+
         conn = psycopg2.connect(
             host=DB_HOST, dbname=DB_NAME, user=DB_USER, password=DB_PASS, port=DB_PORT
         )
         cur = conn.cursor()
 
-        for item in body:
-            lat = item.get("latitude")
-            lon = item.get("longitude")
-    
-            if lat is None or lon is None:
-                # Optionally log or skip such events
-                continue
-            cur.execute("""
-            INSERT INTO defence_data (
-                event_date, event_type, actor1, actor2, civilian_targeting, country,
-                admin1, admin2, admin3, location, latitude, longitude,
-                source, source_scale, source_url, notes, fatalities,
-                weather_condition, temperature, geom
-            ) VALUES (
-                %s, %s, %s, %s, %s, %s,
-                %s, %s, %s, %s, %s, %s,
-                %s, %s, %s, %s, %s,
-                %s, %s,
-                ST_SetSRID(ST_MakePoint(%s, %s), 4326)
-            )
-        """, (
-            datetime.strptime(item["event_date"], "%Y-%m-%d").date(),
-            item.get("event_type"),
-            item.get("actor1"),
-            item.get("actor2"),
-            item.get("civilian_targeting"),
-            item.get("country"),
-            item.get("admin1"),
-            item.get("admin2"),
-            item.get("admin3"),
-            item.get("location"),
-            float(lat),
-            float(lon),
-            item.get("source"),
-            item.get("source_scale"),
-            item.get("source_url"),
-            item.get("notes"),
-            int(item.get("fatalities", 0)),
-            item.get("weather_condition"),
-            int(item.get("temperature", 0)),
-            float(lon),
-            float(lat),
-        ))
-
+        inserted, errors = bulk_insert(cur, rows)
         conn.commit()
+
+        # lets the API drop cached responses built from the previous data
+        if inserted:
+            cur.execute("SELECT bump_data_version()")
+            conn.commit()
         cur.close()
         conn.close()
 
+        duplicates = len(rows) - inserted - len(errors)
         return {
             "statusCode": 200,
             "headers": CORS_HEADERS,
-            "body": json.dumps({"message": f"{len(body)} records inserted successfully"})
+            "body": json.dumps({
+                "message": f"{inserted} records inserted successfully",
+                "received": len(body),
+                "inserted": inserted,
+                "duplicates": duplicates,
+                "skipped": skipped,
+                "errors": errors
+            })
         }
 
     except Exception as e:
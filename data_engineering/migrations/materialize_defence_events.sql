@@ -0,0 +1,143 @@
+-- Materialized replacement for the defence_data_union view.
+-- The view casts id::VARCHAR, pads missing columns and UNIONs both tables on every query, so the
+-- per-table indexes can't serve the API filters. defence_events holds the same rows physically with
+-- its own indexes; insert triggers append new rows as the ingestion paths write them, and
+-- refresh_defence_events() rebuilds it from scratch.
+--
+-- There are no UPDATE or DELETE triggers. Every write to acled_history_events or defence_data other
+-- than a plain INSERT must be followed by
+--     SELECT refresh_defence_events(); SELECT rebuild_defence_event_rollup(); SELECT bump_data_version();
+-- (the rollup is insert-only too, and the version bump invalidates the API's response cache).
+--
+-- psql -h $PG_HOST -U $PG_USER -d borderdata -f data_engineering/migrations/materialize_defence_events.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS defence_events (
+    source_table VARCHAR NOT NULL,
+    event_id_cnty VARCHAR NOT NULL,
+    event_date DATE,
+    event_type VARCHAR,
+    actor1 VARCHAR,
+    actor2 VARCHAR,
+    civilian_targeting TEXT,
+    country VARCHAR,
+    admin1 VARCHAR,
+    admin2 VARCHAR,
+    admin3 VARCHAR,
+    sub_event_type VARCHAR,
+    location VARCHAR,
+    latitude DOUBLE PRECISION,
+    longitude DOUBLE PRECISION,
+    source TEXT,
+    source_scale VARCHAR,
+    source_url TEXT,
+    notes TEXT,
+    fatalities INTEGER,
+    weather_condition VARCHAR,
+    temperature DECIMAL(10,2),
+    geom geometry(Point, 4326),
+    timestamp BIGINT,
+    PRIMARY KEY (source_table, event_id_cnty)
+);
+
+CREATE OR REPLACE FUNCTION append_defence_data_events() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO defence_events
+    SELECT
+        'defence_data', id::VARCHAR, event_date, event_type, actor1, actor2, civilian_targeting::TEXT,
+        country, admin1, admin2, admin3, '', location, latitude, longitude, source, source_scale,
+        source_url, notes, fatalities, weather_condition, temperature, geom, timestamp
+    FROM new_rows
+    ON CONFLICT (source_table, event_id_cnty) DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION append_acled_history_events() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO defence_events
+    SELECT
+        'acled_history_events', event_id_cnty, event_date, event_type, actor1, actor2, civilian_targeting::TEXT,
+        country, admin1, admin2, admin3, sub_event_type, location, latitude, longitude, source, source_scale,
+        '', notes, fatalities, weather_condition, temperature, geom, last_updated
+    FROM new_rows
+    ON CONFLICT (source_table, event_id_cnty) DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_defence_data_events ON defence_data;
+CREATE TRIGGER trg_defence_data_events
+AFTER INSERT ON defence_data
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION append_defence_data_events();
+
+DROP TRIGGER IF EXISTS trg_acled_history_events ON acled_history_events;
+CREATE TRIGGER trg_acled_history_events
+AFTER INSERT ON acled_history_events
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION append_acled_history_events();
+
+-- Rebuilds into a fresh table and swaps it in, readers keep seeing the old rows until the commit
+CREATE OR REPLACE FUNCTION refresh_defence_events() RETURNS void AS $$
+BEGIN
+    CREATE TEMP TABLE defence_events_rebuild (LIKE defence_events INCLUDING ALL) ON COMMIT DROP;
+    INSERT INTO defence_events_rebuild
+    SELECT
+        'defence_data', id::VARCHAR, event_date, event_type, actor1, actor2, civilian_targeting::TEXT,
+        country, admin1, admin2, admin3, '', location, latitude, longitude, source, source_scale,
+        source_url, notes, fatalities, weather_condition, temperature, geom, timestamp
+    FROM defence_data
+    UNION ALL
+    SELECT
+        'acled_history_events', event_id_cnty, event_date, event_type, actor1, actor2, civilian_targeting::TEXT,
+        country, admin1, admin2, admin3, sub_event_type, location, latitude, longitude, source, source_scale,
+        '', notes, fatalities, weather_condition, temperature, geom, last_updated
+    FROM acled_history_events;
+
+    -- row-level diff so concurrent readers never see an empty table
+    DELETE FROM defence_events e
+    WHERE NOT EXISTS (
+        SELECT 1 FROM defence_events_rebuild r
+        WHERE r.source_table = e.source_table AND r.event_id_cnty = e.event_id_cnty
+    );
+    INSERT INTO defence_events
+    SELECT * FROM defence_events_rebuild
+    ON CONFLICT (source_table, event_id_cnty) DO UPDATE SET
+        event_date = EXCLUDED.event_date,
+        event_type = EXCLUDED.event_type,
+        actor1 = EXCLUDED.actor1,
+        actor2 = EXCLUDED.actor2,
+        civilian_targeting = EXCLUDED.civilian_targeting,
+        country = EXCLUDED.country,
+        admin1 = EXCLUDED.admin1,
+        admin2 = EXCLUDED.admin2,
+        admin3 = EXCLUDED.admin3,
+        sub_event_type = EXCLUDED.sub_event_type,
+        location = EXCLUDED.location,
+        latitude = EXCLUDED.latitude,
+        longitude = EXCLUDED.longitude,
+        source = EXCLUDED.source,
+        source_scale = EXCLUDED.source_scale,
+        source_url = EXCLUDED.source_url,
+        notes = EXCLUDED.notes,
+        fatalities = EXCLUDED.fatalities,
+        weather_condition = EXCLUDED.weather_condition,
+        temperature = EXCLUDED.temperature,
+        geom = EXCLUDED.geom,
+        timestamp = EXCLUDED.timestamp;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT refresh_defence_events();
+
+CREATE INDEX IF NOT EXISTS idx_events_admin1 ON defence_events(admin1);
+CREATE INDEX IF NOT EXISTS idx_events_event_type ON defence_events(event_type);
+CREATE INDEX IF NOT EXISTS idx_events_event_date ON defence_events(event_date);
+CREATE INDEX IF NOT EXISTS idx_events_date_event_id ON defence_events(event_date DESC, event_id_cnty DESC);
+CREATE INDEX IF NOT EXISTS idx_events_geom ON defence_events USING GIST (geom);
+
+COMMIT;
+
+ANALYZE defence_events;
@@ -160,3 +160,119 @@ FROM acled_history_events;
 -- uvicorn main:app --reload
 -- uvicorn api.main:app --host 0.0.0.0 --port 8000 --reload
 --npm run dev
+
+
+-- Daily rollups used by the dashboard endpoints (kpi, trend, event types, top locations).
+-- Keyed on (day, admin1, admin2, event_type); NULLs are stored as '' so the primary key can dedupe them.
+CREATE TABLE defence_event_rollup (
+    event_day DATE NOT NULL,
+    admin1 VARCHAR NOT NULL DEFAULT '',
+    admin2 VARCHAR NOT NULL DEFAULT '',
+    event_type VARCHAR NOT NULL DEFAULT '',
+    event_count INTEGER NOT NULL DEFAULT 0,
+    fatalities BIGINT NOT NULL DEFAULT 0,
+    civilian_targeting INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (event_day, admin1, admin2, event_type)
+);
+
+CREATE INDEX idx_rollup_location ON defence_event_rollup(admin2, admin1);
+
+-- Folds a batch of new rows into the rollup, called from the insert triggers below
+-- so both the Supabase insert in daily_events.py and the Lambda handler keep it current.
+CREATE OR REPLACE FUNCTION apply_defence_event_rollup() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO defence_event_rollup AS r (event_day, admin1, admin2, event_type, event_count, fatalities, civilian_targeting)
+    SELECT
+        event_date,
+        COALESCE(admin1, ''),
+        COALESCE(admin2, ''),
+        COALESCE(event_type, ''),
+        count(*),
+        COALESCE(sum(fatalities), 0),
+        sum(CASE WHEN civilian_targeting IS NOT NULL AND civilian_targeting::text NOT IN ('', 'false', 'f', '0') THEN 1 ELSE 0 END)
+    FROM new_rows
+    WHERE event_date IS NOT NULL
+    GROUP BY 1, 2, 3, 4
+    ON CONFLICT (event_day, admin1, admin2, event_type) DO UPDATE SET
+        event_count = r.event_count + EXCLUDED.event_count,
+        fatalities = r.fatalities + EXCLUDED.fatalities,
+        civilian_targeting = r.civilian_targeting + EXCLUDED.civilian_targeting;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_defence_data_rollup
+AFTER INSERT ON defence_data
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION apply_defence_event_rollup();
+
+CREATE TRIGGER trg_acled_history_rollup
+AFTER INSERT ON acled_history_events
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION apply_defence_event_rollup();
+
+-- Full rebuild, for the initial backfill or after deletes/updates on the source tables
+CREATE OR REPLACE FUNCTION rebuild_defence_event_rollup() RETURNS void AS $$
+BEGIN
+    TRUNCATE defence_event_rollup;
+    INSERT INTO defence_event_rollup (event_day, admin1, admin2, event_type, event_count, fatalities, civilian_targeting)
+    SELECT
+        event_date,
+        COALESCE(admin1, ''),
+        COALESCE(admin2, ''),
+        COALESCE(event_type, ''),
+        count(*),
+        COALESCE(sum(fatalities), 0),
+        sum(CASE WHEN civilian_targeting IS NOT NULL AND civilian_targeting::text NOT IN ('', 'false', 'f', '0') THEN 1 ELSE 0 END)
+    FROM defence_data_union
+    WHERE event_date IS NOT NULL
+    GROUP BY 1, 2, 3, 4;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT rebuild_defence_event_rollup();
+
+
+-- Single-row version stamp, bumped by insert_data (daily_events.py) and lambda_handler after each
+-- committed ingestion run. The API keys its response cache on it.
+CREATE TABLE data_version (
+    id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+INSERT INTO data_version (id, version) VALUES (1, 0);
+
+CREATE OR REPLACE FUNCTION bump_data_version() RETURNS BIGINT AS $$
+    UPDATE data_version SET version = version + 1, updated_at = now() WHERE id = 1 RETURNING version;
+$$ LANGUAGE sql;
+
+
+-- Keyset pagination on (event_date, event_id_cnty) for /event-timeline and /events/geojson/filter.
+-- defence_data exposes id::VARCHAR as event_id_cnty in the union view, so index the same expression.
+CREATE INDEX idx_acled_date_event_id ON acled_history_events(event_date DESC, event_id_cnty DESC);
+CREATE INDEX idx_defence_date_event_id ON defence_data(event_date DESC, (id::VARCHAR) DESC);
+
+
+-- The API reads from defence_events, a physical copy of defence_data_union kept current by insert
+-- triggers. Build it with data_engineering/migrations/materialize_defence_events.sql, and call
+-- refresh_defence_events() after any UPDATE or DELETE on the base tables (see the migration).
+
+
+-- One row per article: daily_events.py upserts on source_url and the Lambda uses ON CONFLICT DO NOTHING,
+-- so a fallback run after a partial one can't insert the same article twice.
+DELETE FROM defence_data d
+USING defence_data keep
+WHERE d.source_url = keep.source_url AND d.id > keep.id;
+
+-- the deleted copies are still in defence_events and counted in the rollup, both are only synced on INSERT.
+-- defence_events exists only once the migration has run; on a fresh setup the migration builds it from here.
+DO $$
+BEGIN
+    IF to_regproc('refresh_defence_events') IS NOT NULL THEN
+        PERFORM refresh_defence_events();
+    END IF;
+END $$;
+SELECT rebuild_defence_event_rollup();
+SELECT bump_data_version();
+
+ALTER TABLE defence_data ADD CONSTRAINT defence_data_source_url_key UNIQUE (source_url);
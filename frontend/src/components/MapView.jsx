@@ -13,6 +13,9 @@ const MapView = () => {
   const map = useRef(null);
   const navControl = useRef(null);
   const tooltipRef = useRef(null);
+  const serverClustered = useRef(false);
+  const latestRequest = useRef(0);
+  const pendingRequest = useRef(null);
 
   const [geoData, setGeoData] = useState(null);
   const [mapStyle, setMapStyle] = useState("mapbox://styles/mapbox/streets-v11");
@@ -34,6 +37,7 @@ const MapView = () => {
       map.current.addControl(navControl.current, "bottom-right");
 
       map.current.on("load", () => {
+        registerLayerHandlers();
         if (filters.from_date && filters.to_date) {
           loadData(filters);
         }
@@ -41,6 +45,19 @@ const MapView = () => {
     }
   }, []);
 
+  // the API only returns what is in view (clustered at low zoom), so refetch when the viewport changes
+  useEffect(() => {
+    if (!map.current) return;
+
+    const onMoveEnd = () => {
+      if (filters.from_date && filters.to_date) {
+        loadData(filters);
+      }
+    };
+    map.current.on("moveend", onMoveEnd);
+    return () => map.current.off("moveend", onMoveEnd);
+  }, [filters]);
+
   useEffect(() => {
     if (!map.current) return;
 
@@ -55,7 +72,7 @@ const MapView = () => {
       current.addControl(navControl.current, "bottom-right");
 
       if (geoData) {
-        addMapLayers(geoData);
+        showEvents(geoData);
       }
     });
   }, [mapStyle]);
@@ -64,6 +81,7 @@ const MapView = () => {
     console.log(filters)
     if (!filters.from_date || !filters.to_date) {
       console.warn("Date range is required.");
+      latestRequest.current++;
       removeEventLayers();
       setGeoData(null);
       return;
@@ -77,28 +95,56 @@ const MapView = () => {
     if (filters.event_type) params.append("event_types", filters.event_type);
     if (filters.from_date) params.append("from_year", filters.from_date);
     if (filters.to_date) params.append("to_year", filters.to_date);
+    if (map.current) {
+      params.append("bbox", map.current.getBounds().toArray().flat().join(","));
+      params.append("zoom", Math.floor(map.current.getZoom()));
+    }
+
+    // a pan or zoom supersedes the previous viewport, only the newest response may reach the map
+    const requestId = ++latestRequest.current;
+    if (pendingRequest.current) pendingRequest.current.abort();
+    const controller = new AbortController();
+    pendingRequest.current = controller;
 
     try {
       const res = await axios.get(
-        `http://ec2-44-222-235-167.compute-1.amazonaws.com:8000/events/geojson/filter?${params}`
+        `http://ec2-44-222-235-167.compute-1.amazonaws.com:8000/events/geojson/filter?${params}`,
+        { signal: controller.signal }
       );
+      if (requestId !== latestRequest.current) return;
       setGeoData(res.data);
 
       if (map.current && map.current.isStyleLoaded()) {
-        removeEventLayers();
-        addMapLayers(res.data);
+        showEvents(res.data);
       } else {
         map.current.once("styledata", () => {
-          addMapLayers(res.data);
+          showEvents(res.data);
         });
       }
     } catch (err) {
-      console.error("Error loading data:", err);
+      if (!axios.isCancel(err)) {
+        console.error("Error loading data:", err);
+      }
     } finally {
-      setLoading(false);
+      if (requestId === latestRequest.current) {
+        setLoading(false);
+      }
     }
   };
 
+  const showEvents = (data) => {
+    if (!map.current) return;
+
+    const source = map.current.getSource("events");
+    // the source's cluster option is fixed at creation, only swap data while the clustering mode is unchanged
+    if (source && serverClustered.current === !!data.clustered) {
+      source.setData(data);
+      return;
+    }
+    removeEventLayers();
+    addMapLayers(data);
+  };
+
   const removeEventLayers = () => {
     const layers = ["clusters", "cluster-count", "unclustered-point"];
     const source = "events";
@@ -117,10 +163,12 @@ const MapView = () => {
   const addMapLayers = (data) => {
     if (!map.current) return;
 
+    serverClustered.current = !!data.clustered;
     map.current.addSource("events", {
       type: "geojson",
       data,
-      cluster: true,
+      // server-side clusters already carry point_count, don't cluster them again
+      cluster: !data.clustered,
       clusterMaxZoom: 14,
       clusterRadius: 50,
     });
@@ -177,7 +225,10 @@ const MapView = () => {
         "circle-stroke-color": "#fff",
       },
     });
+  };
 
+  // layer-scoped handlers stay registered across setData and setStyle, so they are added once
+  const registerLayerHandlers = () => {
     map.current.on("mousemove", "unclustered-point", (e) => {
       map.current.getCanvas().style.cursor = "pointer";
       const props = e.features[0].properties;
@@ -211,6 +262,13 @@ const MapView = () => {
         layers: ["clusters"],
       });
       const clusterId = features[0].properties.cluster_id;
+      if (serverClustered.current) {
+        map.current.easeTo({
+          center: features[0].geometry.coordinates,
+          zoom: map.current.getZoom() + 2,
+        });
+        return;
+      }
       map.current.getSource("events").getClusterExpansionZoom(
         clusterId,
         (err, zoom) => {
@@ -11,13 +11,18 @@ const typeColors = {
 const EventTimeline = () => {
   const [events, setEvents] = useState([]);
   const [expanded, setExpanded] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+
+  const fetchTimeline = async (cursor = null) => {
+    const params = new URLSearchParams();
+    if (cursor) params.append("cursor", cursor);
+    const res = await fetch(`${import.meta.env.VITE_API_URL}/event-timeline?${params}`);
+    const json = await res.json();
+    setEvents((prev) => (cursor ? [...prev, ...json.items] : json.items));
+    setNextCursor(json.next_cursor);
+  };
 
   useEffect(() => {
-    const fetchTimeline = async () => {
-      const res = await fetch(`${import.meta.env.VITE_API_URL}/event-timeline`);
-      const json = await res.json();
-      setEvents(json);
-    };
     fetchTimeline();
   }, []);
 
@@ -51,6 +56,14 @@ const EventTimeline = () => {
           </li>
         ))}
       </ul>
+      {nextCursor && (
+        <button
+          onClick={() => fetchTimeline(nextCursor)}
+          className="mt-4 text-sm text-gray-300 hover:text-white"
+        >
+          Load more
+        </button>
+      )}
     </div>
   );
 };